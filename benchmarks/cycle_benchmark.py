@@ -0,0 +1,229 @@
+import argparse
+import asyncio
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+import aiohttp
+from src.cryptkeeper import CryptKeeper
+
+CONFIG_TEMPLATE = """
+[Scraper]
+homepage_url = {url}/
+base_url = {url}
+requests_per_second = {rps}
+burst = {burst}
+max_concurrency = {concurrency}
+parse_executor = {parse_executor}
+
+[Pushover]
+user_key = benchmark
+api_token = benchmark
+api_url = {url}/1/messages.json
+
+[Notifications]
+limit = 1000000
+
+[Database]
+path = {db}
+"""
+
+
+async def wait_for_server(url: str, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while True:
+            try:
+                async with session.get(f"{url}/__stats") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                if time.monotonic() > deadline:
+                    raise
+            await asyncio.sleep(0.1)
+
+
+async def server_call(url: str, method: str, path: str) -> dict:
+    async with aiohttp.ClientSession() as session:
+        async with session.request(method, f"{url}{path}") as response:
+            return await response.json()
+
+
+class Counters:
+    def __init__(self):
+        self.db_statements = 0
+        self.parse_seconds = defaultdict(float)
+        self.parse_calls = defaultdict(int)
+
+    def count_statement(self, _statement):
+        self.db_statements += 1
+
+    def snapshot(self):
+        return (
+            self.db_statements,
+            dict(self.parse_seconds),
+            dict(self.parse_calls),
+        )
+
+
+def instrument(scraper, counters: Counters):
+    run_parser = scraper.run_parser
+
+    async def timed_run_parser(func, *args):
+        start = time.perf_counter()
+        try:
+            return await run_parser(func, *args)
+        finally:
+            counters.parse_seconds[func.__name__] += time.perf_counter() - start
+            counters.parse_calls[func.__name__] += 1
+
+    scraper.run_parser = timed_run_parser
+
+
+async def run_cycle(name, crypt_keeper, scraper, counters, url):
+    before_stats = await server_call(url, "GET", "/__stats")
+    db_before, parse_before, calls_before = counters.snapshot()
+    start = time.perf_counter()
+    new_items = await scraper.scrape()
+    await crypt_keeper.notification_manager.outbox.drain()
+    elapsed = time.perf_counter() - start
+    after_stats = await server_call(url, "GET", "/__stats")
+    db_after, parse_after, calls_after = counters.snapshot()
+
+    requests = after_stats["requests"] - before_stats["requests"]
+    db_ops = db_after - db_before
+    parse = {
+        func: {
+            "calls": calls_after[func] - calls_before.get(func, 0),
+            "ms_per_page": 1000
+            * (parse_after[func] - parse_before.get(func, 0.0))
+            / max(1, calls_after[func] - calls_before.get(func, 0)),
+        }
+        for func in calls_after
+        if calls_after[func] != calls_before.get(func, 0)
+    }
+    return {
+        "cycle": name,
+        "new_items": new_items,
+        "wall_seconds": elapsed,
+        "requests": requests,
+        "requests_per_second": requests / elapsed if elapsed else 0.0,
+        "bytes": after_stats["bytes"] - before_stats["bytes"],
+        "http_errors": after_stats["errors"] - before_stats["errors"],
+        "not_modified": after_stats["not_modified"] - before_stats["not_modified"],
+        "pushes": after_stats["pushes"] - before_stats["pushes"],
+        "db_ops": db_ops,
+        "db_ops_per_second": db_ops / elapsed if elapsed else 0.0,
+        "parse": parse,
+        "peak_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def print_report(results):
+    print(
+        f"{'cycle':<8}{'new':>7}{'wall s':>9}{'reqs':>7}{'req/s':>9}"
+        f"{'db ops':>8}{'db op/s':>10}{'304s':>6}{'errs':>6}{'pushes':>8}{'rss MiB':>9}"
+    )
+    for r in results:
+        print(
+            f"{r['cycle']:<8}{r['new_items']:>7}{r['wall_seconds']:>9.2f}"
+            f"{r['requests']:>7}{r['requests_per_second']:>9.1f}{r['db_ops']:>8}"
+            f"{r['db_ops_per_second']:>10.1f}{r['not_modified']:>6}{r['http_errors']:>6}"
+            f"{r['pushes']:>8}{r['peak_rss_mib']:>9.1f}"
+        )
+        for func, timing in r["parse"].items():
+            print(
+                f"{'':<8}{func}: {timing['calls']} pages, "
+                f"{timing['ms_per_page']:.2f} ms/page"
+            )
+
+
+async def run(args):
+    url = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.standin_server",
+            "--port",
+            str(args.port),
+            "--items",
+            str(args.items),
+            "--latency-ms",
+            str(args.latency_ms),
+            "--jitter-ms",
+            str(args.jitter_ms),
+            "--error-rate",
+            str(args.error_rate),
+        ]
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        config_file = Path(tmp) / "config.ini"
+        config_file.write_text(
+            CONFIG_TEMPLATE.format(
+                url=url,
+                rps=args.rps,
+                burst=args.burst,
+                concurrency=args.concurrency,
+                parse_executor=args.parse_executor,
+                db=Path(tmp) / "benchmark.db",
+            )
+        )
+        crypt_keeper = CryptKeeper(str(config_file))
+        scraper = crypt_keeper.sources[0].scraper
+        counters = Counters()
+        instrument(scraper, counters)
+        try:
+            await wait_for_server(url)
+            await crypt_keeper.db_handler.setup_tables()
+            await crypt_keeper.notification_manager.setup()
+            db = await crypt_keeper.db_handler.connect()
+            await db.set_trace_callback(counters.count_statement)
+
+            results = [
+                await run_cycle("cold", crypt_keeper, scraper, counters, url),
+                await run_cycle("warm", crypt_keeper, scraper, counters, url),
+            ]
+            if args.new_items:
+                await server_call(url, "POST", f"/__advance?count={args.new_items}")
+                results.append(
+                    await run_cycle("churn", crypt_keeper, scraper, counters, url)
+                )
+        finally:
+            await scraper.close()
+            await crypt_keeper.notification_manager.close()
+            await crypt_keeper.http_client.close()
+            await crypt_keeper.db_handler.close()
+            server.terminate()
+            server.wait()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run scrape cycles end to end against the local stand-in site"
+    )
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--new-items", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rps", type=float, default=1000.0)
+    parser.add_argument("--burst", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--parse-executor", default="thread")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--json", action="store_true")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import argparse
+import time
+import tracemalloc
+from pathlib import Path
+from src.parsing import PARSERS, choose_parser, make_soup, strainer as named_strainer
+
+FIXTURES = Path(__file__).parent / "fixtures"
+PAGES = {
+    "homepage.html": named_strainer("homepage"),
+    "news.html": named_strainer("news_content"),
+    "release.html": named_strainer("release_system"),
+}
+
+
+def measure(content, parser, strainer, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        make_soup(content, parser, strainer)
+    elapsed = (time.perf_counter() - start) / rounds
+
+    tracemalloc.start()
+    soup = make_soup(content, parser, strainer)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del soup
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full and strained parses")
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    backends = sorted({choose_parser(name) for name in PARSERS})
+    print(f"{'page':<15}{'parser':<13}{'mode':<10}{'ms/parse':>10}{'peak KiB':>10}")
+    for page, strainer in PAGES.items():
+        content = (FIXTURES / page).read_text()
+        for backend in backends:
+            for mode, parse_only in (("full", None), ("strained", strainer)):
+                elapsed, peak = measure(content, backend, parse_only, args.rounds)
+                print(
+                    f"{page:<15}{backend:<13}{mode:<10}"
+                    f"{elapsed * 1000:>10.2f}{peak / 1024:>10.0f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
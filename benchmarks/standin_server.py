@@ -0,0 +1,147 @@
+import argparse
+import asyncio
+import hashlib
+import random
+import re
+from pathlib import Path
+from aiohttp import web
+
+FIXTURES = Path(__file__).parent / "fixtures"
+NEWS_ENTRY = re.compile(r'<dd><b>([^<]*):</b> <a href="[^"]*">([^<]*)</a></dd>')
+RELEASE_ENTRY = re.compile(
+    r'<li>([^:<]*): <a href="[^"]*">([^<]*)</a> <i>([^<]*)</i></li>'
+)
+
+
+class StandInSite:
+    def __init__(
+        self,
+        items: int = 30,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        etags: bool = True,
+        seed: int = 0,
+    ):
+        self.items = items
+        self.offset = 0
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.etags = etags
+        self.random = random.Random(seed)
+        self.stats = {"requests": 0, "bytes": 0, "errors": 0, "not_modified": 0}
+        self.pushes = []
+
+        homepage = (FIXTURES / "homepage.html").read_text()
+        self.news_templates = NEWS_ENTRY.findall(homepage)
+        self.release_templates = RELEASE_ENTRY.findall(homepage)
+        self.homepage_parts = re.split(
+            r"(?s)<dl>.*?</dl>|<ul>\n.*?</ul>", homepage, maxsplit=2
+        )
+        self.news_page = (FIXTURES / "news.html").read_text()
+        self.release_page = (FIXTURES / "release.html").read_text()
+        self.homepage_cache = None
+
+    def homepage(self) -> str:
+        # Item numbers count down from the newest, so advancing the offset
+        # pushes new entries onto the top like the real front page.
+        if self.homepage_cache is None:
+            newest = self.items + self.offset
+            news, releases = [], []
+            for i in range(newest - 1, self.offset - 1, -1):
+                date, title = self.news_templates[i % len(self.news_templates)]
+                news.append(
+                    f'<dd><b>{date}:</b> <a href="/news/News_item_{i}">{title} {i}</a></dd>\n'
+                )
+                date, title, author = self.release_templates[
+                    i % len(self.release_templates)
+                ]
+                releases.append(
+                    f'<li>{date}: <a href="/wiki/Release_{i}">{title} {i}</a> <i>{author}</i></li>\n'
+                )
+            before, middle, after = self.homepage_parts
+            self.homepage_cache = (
+                f"{before}<dl>\n{''.join(news)}</dl>{middle}"
+                f"<ul>\n{''.join(releases)}</ul>{after}"
+            )
+        return self.homepage_cache
+
+    @web.middleware
+    async def middleware(self, request, handler):
+        if request.path.startswith("/__"):
+            return await handler(request)
+        self.stats["requests"] += 1
+        if self.latency_ms or self.jitter_ms:
+            delay = self.latency_ms + self.random.uniform(0, self.jitter_ms)
+            await asyncio.sleep(delay / 1000)
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.stats["errors"] += 1
+            return web.Response(status=503, headers={"Retry-After": "0"})
+        response = await handler(request)
+        if self.etags and response.status == 200 and response.body is not None:
+            etag = '"' + hashlib.md5(response.body).hexdigest() + '"'
+            if request.headers.get("If-None-Match") == etag:
+                self.stats["not_modified"] += 1
+                return web.Response(status=304, headers={"ETag": etag})
+            response.headers["ETag"] = etag
+        if response.body is not None:
+            self.stats["bytes"] += len(response.body)
+        return response
+
+    async def handle_homepage(self, request):
+        return web.Response(text=self.homepage(), content_type="text/html")
+
+    async def handle_news(self, request):
+        return web.Response(text=self.news_page, content_type="text/html")
+
+    async def handle_release(self, request):
+        return web.Response(text=self.release_page, content_type="text/html")
+
+    async def handle_push(self, request):
+        data = await request.post()
+        self.pushes.append(dict(data))
+        return web.json_response({"status": 1, "request": "stand-in"})
+
+    async def handle_stats(self, request):
+        return web.json_response({**self.stats, "pushes": len(self.pushes)})
+
+    async def handle_advance(self, request):
+        self.offset += int(request.query.get("count", "1"))
+        self.homepage_cache = None
+        return web.json_response({"offset": self.offset})
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self.middleware])
+        app.router.add_get("/", self.handle_homepage)
+        app.router.add_get("/news/{name}", self.handle_news)
+        app.router.add_get("/wiki/{name}", self.handle_release)
+        app.router.add_post("/1/messages.json", self.handle_push)
+        app.router.add_get("/__stats", self.handle_stats)
+        app.router.add_post("/__advance", self.handle_advance)
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fixture pages locally")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--items", type=int, default=30)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--no-etags", action="store_true")
+    args = parser.parse_args()
+
+    site = StandInSite(
+        items=args.items,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        etags=not args.no_etags,
+    )
+    web.run_app(site.app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,51 @@
+import argparse
 import asyncio
 import logging
-from src.cryptkeeper import CryptKeeper
+import sys
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
 
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Watch Hidden Palace for updates.")
+    parser.add_argument("--config", default="config.ini")
+    parser.add_argument(
+        "--backfill",
+        action="store_true",
+        help="crawl the [Backfill] archive pages without notifying, then exit",
+    )
+    parser.add_argument(
+        "--restart-backfill",
+        action="store_true",
+        help="ignore the saved backfill checkpoint and start from page 1",
+    )
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="scrape every source once, drain queued work and exit (for cron)",
+    )
+    parser.add_argument(
+        "--worker",
+        action="store_true",
+        help="only drain the [Enrichment] job queue shared through the database",
+    )
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    crypt_keeper = CryptKeeper()
-    asyncio.run(crypt_keeper.run())
+    args = parse_args()
+    # Imported after argument parsing so --help does not load the scraping
+    # stack.
+    from src.cryptkeeper import CryptKeeper
+
+    crypt_keeper = CryptKeeper(args.config)
+    if args.backfill or args.restart_backfill:
+        asyncio.run(crypt_keeper.backfill(restart=args.restart_backfill))
+    elif args.worker:
+        asyncio.run(crypt_keeper.run_workers())
+    elif args.once:
+        sys.exit(0 if asyncio.run(crypt_keeper.run_once()) else 1)
+    else:
+        asyncio.run(crypt_keeper.run())
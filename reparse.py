@@ -0,0 +1,56 @@
+import argparse
+import asyncio
+import logging
+import time
+from src.config import Config
+from src.database import DatabaseHandler
+from src.reparser import SNAPSHOT_KINDS, Reparser
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Rerun the extractors over stored page snapshots."
+    )
+    parser.add_argument(
+        "--kind",
+        action="append",
+        choices=SNAPSHOT_KINDS,
+        help="snapshot kind to reparse; repeatable, defaults to all",
+    )
+    parser.add_argument(
+        "--executor", choices=("process", "thread", "inline"), default="process"
+    )
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--config", default="config.ini")
+    return parser.parse_args(argv)
+
+
+async def reparse(args: argparse.Namespace):
+    config = Config(args.config)
+    db_handler = DatabaseHandler(
+        config.get("Database", "path", fallback="cryptkeeper.db")
+    )
+    reparser = Reparser(
+        db_handler,
+        config,
+        executor_kind=args.executor,
+        workers=args.workers,
+        batch_size=args.batch_size,
+    )
+    started = time.perf_counter()
+    try:
+        await db_handler.setup_tables()
+        counts = await reparser.run(args.kind or SNAPSHOT_KINDS)
+    finally:
+        await db_handler.close()
+    summary = ", ".join(f"{count} {kind}" for kind, count in counts.items())
+    logging.info(f"Reparsed {summary} in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    asyncio.run(reparse(parse_args()))
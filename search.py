@@ -0,0 +1,67 @@
+import argparse
+import asyncio
+import sqlite3
+import sys
+import time
+from src.config import Config
+from src.database import DatabaseHandler, fts_query
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Full-text search over the scraped news and releases."
+    )
+    parser.add_argument("query", help='search terms; end a term with "*" for prefixes')
+    parser.add_argument("--kind", choices=("all", "news", "releases"), default="all")
+    parser.add_argument("--system", help="only releases for this system")
+    parser.add_argument("--since", help="earliest date, YYYY-MM-DD")
+    parser.add_argument("--until", help="latest date, YYYY-MM-DD")
+    parser.add_argument("--limit", type=int, default=20, help="results per page")
+    parser.add_argument("--page", type=int, default=1)
+    parser.add_argument(
+        "--raw", action="store_true", help="pass the query to FTS5 unchanged"
+    )
+    parser.add_argument("--config", default="config.ini")
+    return parser.parse_args(argv)
+
+
+async def search(args: argparse.Namespace) -> int:
+    config = Config(args.config)
+    db_handler = DatabaseHandler(
+        config.get("Database", "path", fallback="cryptkeeper.db")
+    )
+    try:
+        # Creates and backfills the index on databases that predate it.
+        await db_handler.setup_tables()
+        started = time.perf_counter()
+        try:
+            results = await db_handler.search(
+                args.query if args.raw else fts_query(args.query),
+                kind=args.kind,
+                system=args.system,
+                since=args.since,
+                until=args.until,
+                limit=args.limit,
+                offset=(max(args.page, 1) - 1) * args.limit,
+            )
+        except sqlite3.OperationalError as e:
+            print(f"Invalid search query: {e}", file=sys.stderr)
+            return 2
+        elapsed = (time.perf_counter() - started) * 1000
+    finally:
+        await db_handler.close()
+
+    for result in results:
+        details = f" [{result.system}]" if result.system else ""
+        if result.author:
+            details += f" by {result.author}"
+        print(f"{result.date}  {result.kind:<7}  {result.title}{details}")
+        print(f"    {result.url}")
+        if result.snippet and result.snippet != result.title:
+            print(f"    {result.snippet}")
+    print(f"{len(results)} results on page {args.page} ({elapsed:.1f} ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(search(parse_args())))
@@ -1,17 +1,125 @@
 import configparser
-from typing import Any, Dict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+PARSER_CHOICES = ("auto", "lxml", "html.parser")
+EXECUTOR_CHOICES = ("thread", "process", "inline")
+
+
+class ConfigError(ValueError):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class ScraperSettings:
+    section: str
+    base_url: str
+    homepage_url: Optional[str]
+    parser: str
+    parse_executor: str
+    parse_workers: Optional[int]
+    max_retries: int
+    max_concurrency: int
+    stream_details: bool
+    max_stream_bytes: int
+    stream_chunk_size: int
+    snapshots: bool
+
+    @classmethod
+    def from_config(cls, config: "Config", section: str) -> "ScraperSettings":
+        def setting(key: str, fallback: Any = None, kind: str = "") -> Any:
+            return config.setting(section, key, fallback, kind)
+
+        settings = cls(
+            section=section,
+            base_url=setting("base_url", ""),
+            homepage_url=setting("homepage_url"),
+            parser=setting("parser", "auto"),
+            parse_executor=setting("parse_executor", "thread"),
+            parse_workers=setting("parse_workers", None, "int"),
+            max_retries=setting("max_retries", 3, "int"),
+            max_concurrency=setting("max_concurrency", 5, "int"),
+            stream_details=setting("stream_details", False, "boolean"),
+            max_stream_bytes=setting("max_stream_bytes", 2 * 1024 * 1024, "int"),
+            stream_chunk_size=setting("stream_chunk_size", 16 * 1024, "int"),
+            snapshots=setting("snapshots", False, "boolean"),
+        )
+        settings.validate()
+        return settings
+
+    def validate(self):
+        for key in ("base_url", "homepage_url"):
+            url = getattr(self, key)
+            if url and not url.startswith(("http://", "https://")):
+                raise ConfigError(f"[{self.section}] {key} must be an http(s) URL")
+        if self.parser not in PARSER_CHOICES:
+            raise ConfigError(
+                f"[{self.section}] parser must be one of {', '.join(PARSER_CHOICES)}"
+            )
+        if self.parse_executor not in EXECUTOR_CHOICES:
+            raise ConfigError(
+                f"[{self.section}] parse_executor must be one of "
+                f"{', '.join(EXECUTOR_CHOICES)}"
+            )
+        for key in ("max_concurrency", "stream_chunk_size"):
+            if getattr(self, key) < 1:
+                raise ConfigError(f"[{self.section}] {key} must be at least 1")
+        for key in ("max_retries", "max_stream_bytes"):
+            if getattr(self, key) < 0:
+                raise ConfigError(f"[{self.section}] {key} must not be negative")
+        if self.parse_workers is not None and self.parse_workers < 1:
+            raise ConfigError(f"[{self.section}] parse_workers must be at least 1")
 
 
 class Config:
     def __init__(self, config_file: str = "config.ini"):
+        self.config_file = config_file
         self.config = configparser.ConfigParser()
-        self.config.read(config_file)
+        self.files = self.config.read(config_file)
+        self.scraper_cache: Dict[str, ScraperSettings] = {}
+
+    def scraper_settings(self, section: str = "Scraper") -> ScraperSettings:
+        # Built and validated once per section; hot paths read the frozen
+        # snapshot instead of going back through configparser.
+        settings = self.scraper_cache.get(section)
+        if settings is None:
+            settings = ScraperSettings.from_config(self, section)
+            self.scraper_cache[section] = settings
+        return settings
+
+    def setting(
+        self,
+        section: str,
+        key: str,
+        fallback: Any = None,
+        kind: str = "",
+        inherit: bool = True,
+    ) -> Any:
+        # Per-source sections override the shared [Scraper] defaults. Values
+        # that do not convert raise ConfigError, so a reload can reject the
+        # whole file instead of failing halfway through applying it.
+        getter = getattr(self, f"get{kind}")
+        try:
+            if inherit:
+                fallback = getter("Scraper", key, fallback)
+            return getter(section, key, fallback)
+        except ValueError as e:
+            raise ConfigError(f"[{section}] {key}: {e}") from e
 
     def get_section(self, section: str) -> Dict[str, str]:
         return dict(self.config[section])
 
+    def sections(self, prefix: str = "") -> List[str]:
+        return [name for name in self.config.sections() if name.startswith(prefix)]
+
     def get(self, section: str, key: str, fallback: Any = None) -> Any:
         return self.config.get(section, key, fallback=fallback)
 
     def getint(self, section: str, key: str, fallback: int = None) -> int:
         return self.config.getint(section, key, fallback=fallback)
+
+    def getfloat(self, section: str, key: str, fallback: float = None) -> float:
+        return self.config.getfloat(section, key, fallback=fallback)
+
+    def getboolean(self, section: str, key: str, fallback: bool = None) -> bool:
+        return self.config.getboolean(section, key, fallback=fallback)
@@ -1,36 +1,380 @@
 import asyncio
+import configparser
 import logging
-from src.config import Config
+import signal
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from src.config import Config, ConfigError
 from src.database import DatabaseHandler
+from src.http_client import HttpClient
+from src.metrics import METRICS
 from src.notification.notification_manager import NotificationManager
-from src.scrapers.homepage_scraper import HomepageScraper
-from src.notification.notification_tracking import (
-    setup_notification_tracking,
-    clean_old_notifications,
-)
+from src.rate_limiter import HostRateLimiter
+from src.scheduler import Scheduler, Source
+from src.scrapers.registry import get_scraper_class
+
+if TYPE_CHECKING:
+    from src.enrichment import EnrichmentWorker
+
+# Settings in these sections are read once at startup by long-lived objects
+# (connections, servers, limiters) and are not swapped by a reload.
+RESTART_SECTIONS = ("Database", "HTTP", "Metrics", "Feeds", "Notifications", "Pushover")
+# The enrichment mode and worker counts decide which tasks exist at all.
+RESTART_ENRICHMENT_KEYS = ("mode", "workers", "local_workers")
 
 
 class CryptKeeper:
     def __init__(self, config_file: str = "config.ini"):
         self.config = Config(config_file)
-        self.db_handler = DatabaseHandler()
+        self.db_handler = DatabaseHandler(
+            self.config.get("Database", "path", fallback="cryptkeeper.db")
+        )
+        self.http_client = HttpClient.from_config(self.config)
         self.notification_manager = NotificationManager(
-            self.config.get_section("Pushover")
+            self.config.get_section("Pushover"),
+            self.db_handler,
+            limit=self.config.getint("Notifications", "limit", 10),
+            window=timedelta(
+                minutes=self.config.getfloat("Notifications", "window_minutes", 60)
+            ),
+            max_digest_entries=self.config.getint(
+                "Notifications", "max_digest_entries", 20
+            ),
+            http_client=self.http_client,
+        )
+        self.rate_limiter = HostRateLimiter.from_config(self.config)
+        self.sources = self.build_sources()
+        self.metrics_json_path = self.config.get("Metrics", "json_path")
+        self.metrics_server = None
+        self.feed_server = None
+        # The HTTP servers pull in aiohttp.web, so they are only imported
+        # when configured; a --once run from cron never needs them.
+        metrics_port = self.config.getint("Metrics", "port")
+        if metrics_port is not None:
+            from src.metrics_server import MetricsServer
+
+            self.metrics_server = MetricsServer(
+                metrics_port, self.config.get("Metrics", "host", "127.0.0.1")
+            )
+        feeds_port = self.config.getint("Feeds", "port")
+        if feeds_port is not None:
+            from src.feed_server import FeedServer
+
+            self.feed_server = FeedServer(
+                self.db_handler,
+                feeds_port,
+                host=self.config.get("Feeds", "host", "127.0.0.1"),
+                public_url=self.config.get("Feeds", "public_url"),
+                site_url=self.config.scraper_settings().base_url,
+                limit=self.config.getint("Feeds", "limit", 50),
+                max_age=self.config.getint("Feeds", "max_age", 60),
+                recheck_seconds=self.config.getfloat("Feeds", "recheck_seconds", 5),
+            )
+        self.scheduler = Scheduler(
+            self.sources, self.db_handler, after_run=self.dump_metrics
+        )
+        self.queue_enrichment = (
+            self.config.get("Enrichment", "mode", "inline") == "queue"
+        )
+        self.workers: List["EnrichmentWorker"] = []
+
+    def build_sources(self) -> List[Source]:
+        # Without any [Source:<name>] sections, [Scraper] alone describes a
+        # single homepage source, as before the registry existed.
+        sections = self.config.sections("Source:") or ["Scraper"]
+        sources = []
+        for section in sections:
+            name = section.partition(":")[2] or "homepage"
+            scraper_class = get_scraper_class(
+                self.config.get(section, "scraper", "homepage")
+            )
+            has_own_rate = self.has_own_rate(self.config, section)
+            scraper = scraper_class(
+                self.db_handler,
+                self.notification_manager,
+                self.config,
+                section=section,
+                rate_limiter=None if has_own_rate else self.rate_limiter,
+                http_client=self.http_client,
+            )
+            sources.append(Source(name, scraper, **self.schedule(self.config, section)))
+        return sources
+
+    @staticmethod
+    def has_own_rate(config: Config, section: str) -> bool:
+        return (
+            section != "Scraper"
+            and config.get(section, "requests_per_second") is not None
+        )
+
+    @staticmethod
+    def schedule(config: Config, section: str) -> Dict[str, Any]:
+        def setting(key: str, fallback: float = None) -> float:
+            return config.setting(section, key, fallback, "float")
+
+        def seconds(key: str) -> Optional[float]:
+            hours = setting(key)
+            return hours * 3600 if hours is not None else None
+
+        schedule = {
+            "interval": setting("interval_hours", 6) * 3600,
+            "jitter": setting("jitter_minutes", 0) * 60,
+            "min_interval": seconds("min_interval_hours"),
+            "max_interval": seconds("max_interval_hours"),
+            "ewma_alpha": setting("ewma_alpha", 0.3),
+            "polls_per_change": setting("polls_per_change", 2.0),
+        }
+        if schedule["interval"] <= 0:
+            raise ConfigError(f"[{section}] interval_hours must be positive")
+        if schedule["jitter"] < 0:
+            raise ConfigError(f"[{section}] jitter_minutes must not be negative")
+        if not 0 < schedule["ewma_alpha"] <= 1:
+            raise ConfigError(f"[{section}] ewma_alpha must be in (0, 1]")
+        if schedule["polls_per_change"] <= 0:
+            raise ConfigError(f"[{section}] polls_per_change must be positive")
+        low, high = schedule["min_interval"], schedule["max_interval"]
+        if low is not None and low <= 0:
+            raise ConfigError(f"[{section}] min_interval_hours must be positive")
+        if low is not None and high is not None and low > high:
+            raise ConfigError(
+                f"[{section}] min_interval_hours must not exceed max_interval_hours"
+            )
+        return schedule
+
+    @staticmethod
+    def enrichment_settings(config: Config) -> Dict[str, Any]:
+        def setting(key: str, fallback: Any, kind: str) -> Any:
+            return config.setting("Enrichment", key, fallback, kind, inherit=False)
+
+        settings = {
+            "lease_seconds": setting("lease_seconds", 300, "float"),
+            "max_attempts": setting("max_attempts", 5, "int"),
+            "batch_size": setting("batch_size", 20, "int"),
+            "poll_interval": setting("poll_seconds", 30, "float"),
+        }
+        for key, value in settings.items():
+            if value <= 0:
+                raise ConfigError(f"[Enrichment] {key} must be positive")
+        return settings
+
+    def reload(self):
+        # Runs from the SIGHUP handler. A file that fails to parse or
+        # validate leaves the running settings untouched. Cycles already in
+        # flight finish with the snapshot they started with; sleeping
+        # sources pick up a new interval after their current sleep.
+        try:
+            config = Config(self.config.config_file)
+            if not config.files:
+                raise ConfigError("the file could not be read")
+            updates = [
+                (
+                    source,
+                    config.scraper_settings(source.scraper.section),
+                    self.schedule(config, source.scraper.section),
+                )
+                for source in self.sources
+            ]
+            rates = [
+                HostRateLimiter.settings(config, source.scraper.section)
+                for source in self.sources
+            ]
+            shared_rate = HostRateLimiter.settings(config)
+            worker_settings = config.scraper_settings("Enrichment")
+            enrichment = self.enrichment_settings(config)
+        except (ConfigError, configparser.Error) as e:
+            logging.error(f"Not reloading {self.config.config_file}: {e}")
+            return
+        self.rate_limiter.retune(**shared_rate)
+        restart_only = []
+        for (source, settings, schedule), rate in zip(updates, rates):
+            section = source.scraper.section
+            source.scraper.config = config
+            source.scraper.apply_settings(settings)
+            for key, value in schedule.items():
+                setattr(source, key, value)
+            if self.has_own_rate(self.config, section) != self.has_own_rate(
+                config, section
+            ):
+                # Moving a source on or off the shared limiter swaps objects
+                # that in-flight fetches are waiting on.
+                restart_only.append(f"[{section}] requests_per_second")
+            elif source.scraper.rate_limiter is not self.rate_limiter:
+                source.scraper.rate_limiter.retune(**rate)
+        if self.workers:
+            self.workers[0].scraper.config = config
+            self.workers[0].scraper.apply_settings(worker_settings)
+            self.workers[0].queue.lease_seconds = enrichment["lease_seconds"]
+            self.workers[0].queue.max_attempts = enrichment["max_attempts"]
+            for worker in self.workers:
+                worker.batch_size = enrichment["batch_size"]
+                worker.poll_interval = enrichment["poll_interval"]
+        restart_only += [
+            f"[{section}]"
+            for section in RESTART_SECTIONS
+            if self.section_items(self.config, section)
+            != self.section_items(config, section)
+        ]
+        for key in RESTART_ENRICHMENT_KEYS:
+            if self.config.get("Enrichment", key) != config.get("Enrichment", key):
+                restart_only.append(f"[Enrichment] {key}")
+        if set(self.config.sections("Source:")) != set(config.sections("Source:")):
+            restart_only.append("the set of [Source:*] sections")
+        if restart_only:
+            logging.warning(
+                f"Changes to {', '.join(restart_only)} take effect after a restart"
+            )
+        self.config = config
+        logging.info(f"Reloaded settings from {config.config_file}")
+
+    @staticmethod
+    def section_items(config: Config, section: str) -> Dict[str, str]:
+        return config.get_section(section) if section in config.sections() else {}
+
+    async def dump_metrics(self):
+        if self.metrics_json_path:
+            METRICS.dump_json(self.metrics_json_path)
+
+    def build_workers(self, count: int) -> List["EnrichmentWorker"]:
+        from src.enrichment import EnrichmentQueue, EnrichmentWorker
+
+        settings = self.enrichment_settings(self.config)
+        queue = EnrichmentQueue(
+            self.db_handler,
+            lease_seconds=settings["lease_seconds"],
+            max_attempts=settings["max_attempts"],
+        )
+        # Workers share one scraper, so max_concurrency and the write buffer
+        # apply across all of them.
+        scraper = get_scraper_class("homepage")(
+            self.db_handler,
+            self.notification_manager,
+            self.config,
+            section="Enrichment",
+            rate_limiter=self.rate_limiter,
+            http_client=self.http_client,
         )
-        self.homepage_scraper = HomepageScraper(
-            self.db_handler, self.notification_manager, self.config
+        self.workers = [
+            EnrichmentWorker(
+                queue,
+                scraper,
+                name=f"worker-{number}",
+                batch_size=settings["batch_size"],
+                poll_interval=settings["poll_interval"],
+            )
+            for number in range(count)
+        ]
+        return self.workers
+
+    async def close_workers(self, tasks: List[asyncio.Task]):
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.workers:
+            await self.workers[0].scraper.close()
+
+    def watch_reload(self) -> bool:
+        if not hasattr(signal, "SIGHUP"):
+            return False
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, self.reload)
+        return True
+
+    def unwatch_reload(self, watching: bool):
+        if watching:
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+
+    async def run_workers(self):
+        # A worker-only process drains the shared job table; the daemon that
+        # runs the scheduler also delivers the notifications they queue.
+        await self.db_handler.setup_tables()
+        await self.notification_manager.setup()
+        workers = self.build_workers(self.config.getint("Enrichment", "workers", 1))
+        tasks = [asyncio.create_task(worker.run()) for worker in workers]
+        watching = self.watch_reload()
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            self.unwatch_reload(watching)
+            await self.close_workers(tasks)
+            await self.notification_manager.close()
+            await self.http_client.close()
+            await self.db_handler.close()
+
+    async def backfill(self, restart: bool = False) -> int:
+        scraper = get_scraper_class(self.config.get("Backfill", "scraper", "backfill"))(
+            self.db_handler,
+            self.notification_manager,
+            self.config,
+            section="Backfill",
+            rate_limiter=self.rate_limiter,
+            http_client=self.http_client,
         )
+        scraper.restart = restart
+        await self.db_handler.setup_tables()
+        try:
+            return await scraper.scrape()
+        finally:
+            await scraper.close()
+            await self.http_client.close()
+            await self.db_handler.close()
+
+    async def run_once(self) -> bool:
+        # One pass for cron or a systemd timer: every source is scraped once
+        # regardless of its schedule, queued enrichment is drained, and due
+        # notifications are sent before exiting. Returns False if any source
+        # failed so the caller can exit non-zero.
+        await self.db_handler.setup_tables()
+        await self.notification_manager.setup()
+        try:
+            await self.scheduler.load_state()
+            results = await asyncio.gather(
+                *[self.scheduler.run_once(source) for source in self.sources]
+            )
+            if self.queue_enrichment:
+                workers = self.build_workers(
+                    self.config.getint("Enrichment", "local_workers", 1)
+                )
+                # Failed jobs back off into the future, so this stops once
+                # nothing is claimable right now.
+                while sum(
+                    await asyncio.gather(*[worker.run_once() for worker in workers])
+                ):
+                    pass
+            await self.notification_manager.deliver()
+            return all(results)
+        finally:
+            await self.close_workers([])
+            await self.scheduler.close()
+            await self.notification_manager.close()
+            await self.http_client.close()
+            await self.db_handler.close()
 
     async def run(self):
         await self.db_handler.setup_tables()
-        await setup_notification_tracking()
-        scrape_interval = self.config.getint("Scraper", "interval_hours", fallback=6)
+        await self.notification_manager.setup()
+        self.notification_manager.start()
+        watching = self.watch_reload()
+        if self.metrics_server is not None:
+            await self.metrics_server.start()
+        if self.feed_server is not None:
+            await self.feed_server.start()
 
-        while True:
-            logging.info("Starting scrape cycle")
-            await clean_old_notifications()
-            await self.homepage_scraper.scrape()
-            logging.info(
-                f"Scrape cycle completed. Sleeping for {scrape_interval} hours"
+        worker_tasks = []
+        if self.queue_enrichment:
+            workers = self.build_workers(
+                self.config.getint("Enrichment", "local_workers", 1)
             )
-            await asyncio.sleep(scrape_interval * 3600)
+            worker_tasks = [asyncio.create_task(worker.run()) for worker in workers]
+
+        try:
+            await self.scheduler.run()
+        finally:
+            self.unwatch_reload(watching)
+            await self.close_workers(worker_tasks)
+            await self.scheduler.close()
+            if self.metrics_server is not None:
+                await self.metrics_server.close()
+            if self.feed_server is not None:
+                await self.feed_server.close()
+            await self.notification_manager.close()
+            await self.http_client.close()
+            await self.db_handler.close()
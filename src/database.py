@@ -1,137 +1,629 @@
+import asyncio
+import hashlib
+import logging
+import zlib
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
 import aiosqlite
-from src.models import NewsItem, ReleaseItem
+from src.metrics import METRICS
+from src.migrations import MIGRATIONS
+from src.models import (
+    BackfillState,
+    HashStatus,
+    HttpValidators,
+    NewsItem,
+    ReleaseItem,
+    SearchResult,
+    SourceState,
+    WriteBatch,
+    WriteResult,
+    item_hash,
+)
+
+
+def fts_query(text: str) -> str:
+    # Quote every term so punctuation in user input ("sonic-3", "s&k") is
+    # matched literally instead of being parsed as FTS5 syntax. A trailing
+    # "*" keeps working as a prefix search.
+    terms = []
+    for term in text.split():
+        prefix = term.endswith("*") and len(term) > 1
+        term = term.rstrip("*") if prefix else term
+        quoted = '"' + term.replace('"', '""') + '"'
+        terms.append(quoted + "*" if prefix else quoted)
+    return " ".join(terms)
+
+
+def pack_content(content: Optional[str]) -> Optional[Tuple[bytes, bytes]]:
+    if not content:
+        return None
+    data = content.encode()
+    return hashlib.blake2b(data, digest_size=16).digest(), zlib.compress(data)
+
+
+def unpack_content(data: Optional[bytes]) -> Optional[str]:
+    return zlib.decompress(data).decode() if data is not None else None
+
 
 class DatabaseHandler:
-    def __init__(self, db_name: str = "cryptkeeper.db"):
+    PRAGMAS = (
+        "PRAGMA journal_mode = WAL",
+        "PRAGMA synchronous = NORMAL",
+        "PRAGMA temp_store = MEMORY",
+        "PRAGMA cache_size = -8000",
+        "PRAGMA busy_timeout = 5000",
+    )
+
+    # Registered on every connection: the migrations, the search triggers and
+    # the news_text view call them from SQL.
+    SQL_FUNCTIONS = {
+        "item_hash": (3, item_hash),
+        "content_digest": (1, lambda content: pack_content(content)[0]),
+        "deflate": (1, lambda content: pack_content(content)[1]),
+        "inflate": (1, unpack_content),
+    }
+
+    # Stay well below SQLITE_MAX_VARIABLE_NUMBER on older SQLite builds.
+    MAX_BATCH_PARAMS = 900
+
+    def __init__(self, db_name: str = "cryptkeeper.db", cached_statements: int = 128):
         self.db_name = db_name
+        self.cached_statements = cached_statements
+        self.db: Optional[aiosqlite.Connection] = None
+        # Writers share one connection, so a transaction must not interleave
+        # with statements issued by other coroutines.
+        self.write_lock = asyncio.Lock()
+        # Called with every committed batch, e.g. to invalidate caches built
+        # from the archive tables.
+        self.write_listeners: List[Callable[[WriteBatch, WriteResult], None]] = []
 
-    async def setup_tables(self):
-        async with aiosqlite.connect(self.db_name) as db:
-            cursor = await db.cursor()
-            await cursor.execute(
-                """
-            CREATE TABLE IF NOT EXISTS news (
-                id INTEGER PRIMARY KEY,
-                title TEXT NOT NULL,
-                content TEXT,
-                date TEXT NOT NULL,
-                url TEXT NOT NULL,
-                hash TEXT UNIQUE NOT NULL
-            )
-            """
-            )
-            await cursor.execute(
-                """
-            CREATE TABLE IF NOT EXISTS new_releases (
-                id INTEGER PRIMARY KEY,
-                title TEXT NOT NULL,
-                system TEXT,
-                date TEXT NOT NULL,
-                url TEXT NOT NULL,
-                author TEXT,
-                hash TEXT UNIQUE NOT NULL
+    async def connect(self) -> aiosqlite.Connection:
+        if self.db is None:
+            # sqlite3 keeps an LRU of prepared statements per connection, so
+            # reusing one connection also reuses the compiled queries below.
+            self.db = await aiosqlite.connect(
+                self.db_name, cached_statements=self.cached_statements
             )
+            for pragma in self.PRAGMAS:
+                await self.db.execute(pragma)
+            for name, (arity, func) in self.SQL_FUNCTIONS.items():
+                await self.db.create_function(name, arity, func, deterministic=True)
+        return self.db
+
+    async def close(self):
+        if self.db is not None:
+            await self.db.execute("PRAGMA optimize")
+            await self.db.close()
+            self.db = None
+
+    async def fetchone(self, query: str, params: tuple = ()):
+        db = await self.connect()
+        with METRICS.timer("cryptkeeper_db_query_seconds", op="fetchone"):
+            async with db.execute(query, params) as cursor:
+                return await cursor.fetchone()
+
+    async def execute(self, query: str, params: tuple = ()) -> int:
+        with METRICS.timer("cryptkeeper_db_query_seconds", op="execute"):
+            async with self.transaction() as db:
+                async with db.execute(query, params) as cursor:
+                    return cursor.rowcount
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[aiosqlite.Connection]:
+        db = await self.connect()
+        async with self.write_lock:
+            try:
+                yield db
+            except BaseException:
+                await db.rollback()
+                raise
+            with METRICS.timer("cryptkeeper_db_commit_seconds"):
+                await db.commit()
+
+    async def setup_tables(self):
+        db = await self.connect()
+        await db.execute(
             """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+        """
+        )
+        async with db.execute("SELECT MAX(version) FROM schema_version") as cursor:
+            (current,) = await cursor.fetchone()
+        vacuum = False
+        for migration in MIGRATIONS:
+            if migration.version <= (current or 0):
+                continue
+            logging.info(
+                f"Applying schema migration {migration.version}: {migration.description}"
             )
+            async with self.transaction() as db:
+                await db.execute("BEGIN IMMEDIATE")
+                await migration.apply(db)
+                await db.execute(
+                    """
+                INSERT INTO schema_version (version, description, applied_at)
+                VALUES (?, ?, datetime('now'))
+                """,
+                    (migration.version, migration.description),
+                )
+            vacuum = vacuum or migration.vacuum
+        if vacuum:
+            await db.execute("VACUUM")
 
-    async def check_news_exists(self, item_hash: str) -> bool:
-        async with aiosqlite.connect(self.db_name) as db:
-            cursor = await db.cursor()
-            await cursor.execute("SELECT title FROM news WHERE hash = ?", (item_hash,))
-            result = await cursor.fetchone()
-            return result is not None
-
-    async def check_news_has_content(self, item_hash: str) -> bool:
-        async with aiosqlite.connect(self.db_name) as db:
-            cursor = await db.cursor()
-            await cursor.execute(
-                "SELECT content FROM news WHERE hash = ? AND content IS NOT NULL AND content != ''",
-                (item_hash,),
-            )
-            result = await cursor.fetchone()
-            return result is not None
-
-    async def check_new_releases_exists(self, item_hash: str) -> bool:
-        async with aiosqlite.connect(self.db_name) as db:
-            cursor = await db.cursor()
-            await cursor.execute(
-                "SELECT system FROM new_releases WHERE hash = ?", (item_hash,)
-            )
-            result = await cursor.fetchone()
-            return result is not None
-
-    async def check_new_releases_has_system(self, item_hash: str) -> bool:
-        async with aiosqlite.connect(self.db_name) as db:
-            cursor = await db.cursor()
-            await cursor.execute(
-                # Not sure we should be checking for system != '' here
-                "SELECT system FROM new_releases WHERE hash = ? AND system IS NOT NULL AND system != ''",
-                (item_hash,),
-            )
-            result = await cursor.fetchone()
-            return result is not None
+    async def check_news_exists(self, item_hash: bytes) -> bool:
+        result = await self.fetchone(
+            "SELECT title FROM news WHERE hash = ?", (item_hash,)
+        )
+        return result is not None
 
-    async def insert_news(self, item: NewsItem):
-        async with aiosqlite.connect(self.db_name) as db:
-            cursor = await db.cursor()
-            await cursor.execute(
-                """
-            INSERT OR IGNORE INTO news (title, content, date, url, hash)
-            VALUES (?, ?, ?, ?, ?)
+    async def check_news_has_content(self, item_hash: bytes) -> bool:
+        result = await self.fetchone(
+            "SELECT content_digest FROM news WHERE hash = ? AND content_digest IS NOT NULL",
+            (item_hash,),
+        )
+        return result is not None
+
+    async def check_new_releases_exists(self, item_hash: bytes) -> bool:
+        result = await self.fetchone(
+            "SELECT system FROM new_releases WHERE hash = ?", (item_hash,)
+        )
+        return result is not None
+
+    async def check_new_releases_has_system(self, item_hash: bytes) -> bool:
+        result = await self.fetchone(
+            # Not sure we should be checking for system != '' here
+            "SELECT system FROM new_releases WHERE hash = ? AND system IS NOT NULL AND system != ''",
+            (item_hash,),
+        )
+        return result is not None
+
+    async def classify_hashes(
+        self, table: str, complete_column: str, hashes: Iterable[bytes]
+    ) -> HashStatus:
+        hashes = list(dict.fromkeys(hashes))
+        status = HashStatus(unknown=set(hashes))
+        db = await self.connect()
+        with METRICS.timer("cryptkeeper_db_query_seconds", op="classify", table=table):
+            await self.classify_chunks(db, table, complete_column, hashes, status)
+        return status
+
+    async def classify_chunks(
+        self,
+        db: aiosqlite.Connection,
+        table: str,
+        complete_column: str,
+        hashes: List[bytes],
+        status: HashStatus,
+    ):
+        for start in range(0, len(hashes), self.MAX_BATCH_PARAMS):
+            chunk = hashes[start : start + self.MAX_BATCH_PARAMS]
+            placeholders = ", ".join("?" * len(chunk))
+            async with db.execute(
+                f"""
+            SELECT hash, {complete_column} IS NOT NULL AND {complete_column} != ''
+            FROM {table}
+            WHERE hash IN ({placeholders})
             """,
-                (
-                    item.title,
-                    item.content,
-                    item.date,
-                    item.url,
-                    item.hash,
-                ),
-            )
-            await db.commit()
-            return cursor.rowcount > 0
+                chunk,
+            ) as cursor:
+                async for item_hash, complete in cursor:
+                    status.unknown.discard(item_hash)
+                    if complete:
+                        status.done.add(item_hash)
+                    else:
+                        status.incomplete.add(item_hash)
 
-    async def insert_release(self, item: ReleaseItem):
-        async with aiosqlite.connect(self.db_name) as db:
-            cursor = await db.cursor()
-            await cursor.execute(
+    async def classify_news_hashes(self, hashes: Iterable[bytes]) -> HashStatus:
+        return await self.classify_hashes("news", "content_digest", hashes)
+
+    async def classify_release_hashes(self, hashes: Iterable[bytes]) -> HashStatus:
+        return await self.classify_hashes("new_releases", "system", hashes)
+
+    async def write_batch(self, batch: WriteBatch) -> WriteResult:
+        result = WriteResult()
+        if not len(batch):
+            return result
+
+        METRICS.inc("cryptkeeper_db_batch_rows_total", len(batch))
+        with METRICS.timer("cryptkeeper_db_query_seconds", op="write_batch"):
+            await self.apply_batch(batch, result)
+        for listener in self.write_listeners:
+            listener(batch, result)
+        return result
+
+    async def apply_batch(self, batch: WriteBatch, result: WriteResult):
+        async with self.transaction() as db:
+            if batch.news:
+                known = await self.classify_news_hashes(
+                    item.hash for item in batch.news
+                )
+                result.inserted_news = set(known.unknown)
+                digests = await self.store_content(
+                    db, [item.content for item in batch.news]
+                )
+                await db.executemany(
+                    """
+                INSERT OR IGNORE INTO news (title, content_digest, date, url, hash)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                    [
+                        (item.title, digest, item.date, item.url, item.hash)
+                        for item, digest in zip(batch.news, digests)
+                    ],
+                )
+                await self.enqueue_jobs(
+                    db,
+                    "news",
+                    [
+                        item.hash
+                        for item, digest in zip(batch.news, digests)
+                        if digest is None and item.hash in result.inserted_news
+                    ],
+                    batch.notify_new,
+                )
+                await self.retry_jobs(
+                    db,
+                    "news",
+                    [
+                        item.hash
+                        for item, digest in zip(batch.news, digests)
+                        if digest is None and item.hash not in result.inserted_news
+                    ],
+                )
+            if batch.releases:
+                known = await self.classify_release_hashes(
+                    item.hash for item in batch.releases
+                )
+                result.inserted_releases = set(known.unknown)
+                await db.executemany(
+                    """
+                INSERT OR IGNORE INTO new_releases (title, system, date, url, author, hash)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                    [
+                        (
+                            item.title,
+                            item.system,
+                            item.date,
+                            item.url,
+                            item.author,
+                            item.hash,
+                        )
+                        for item in batch.releases
+                    ],
+                )
+                await self.enqueue_jobs(
+                    db,
+                    "release",
+                    [
+                        item.hash
+                        for item in batch.releases
+                        if not item.system and item.hash in result.inserted_releases
+                    ],
+                    batch.notify_new,
+                )
+                await self.retry_jobs(
+                    db,
+                    "release",
+                    [
+                        item.hash
+                        for item in batch.releases
+                        if not item.system and item.hash not in result.inserted_releases
+                    ],
+                )
+            if batch.news_content:
+                digests = await self.store_content(db, batch.news_content.values())
+                await db.executemany(
+                    "UPDATE news SET content_digest = ? WHERE hash = ?",
+                    list(zip(digests, batch.news_content)),
+                )
+                await self.complete_jobs(db, "news", batch.news_content)
+            if batch.release_systems:
+                await db.executemany(
+                    "UPDATE new_releases SET system = ? WHERE hash = ?",
+                    [(system, h) for h, system in batch.release_systems.items()],
+                )
+                await self.complete_jobs(db, "release", batch.release_systems)
+            if batch.snapshots:
+                digests = await self.store_content(
+                    db, [snapshot.content for snapshot in batch.snapshots]
+                )
+                await db.executemany(
+                    """
+                INSERT INTO page_snapshots (url, kind, digest, fetched_at)
+                VALUES (?, ?, ?, ?)
+                """,
+                    [
+                        (snapshot.url, snapshot.kind, digest, snapshot.fetched_at)
+                        for snapshot, digest in zip(batch.snapshots, digests)
+                        if digest is not None
+                    ],
+                )
+            if batch.validators:
+                await db.executemany(
+                    """
+                INSERT OR REPLACE INTO http_cache
+                    (url, etag, last_modified, digest, updated_at)
+                VALUES (?, ?, ?, ?, datetime('now'))
+                """,
+                    [
+                        (v.url, v.etag, v.last_modified, v.digest)
+                        for v in batch.validators.values()
+                    ],
+                )
+
+    async def enqueue_jobs(
+        self,
+        db: aiosqlite.Connection,
+        kind: str,
+        hashes: List[bytes],
+        notify: bool = False,
+    ):
+        # Every stored item missing its details gets a job in the same
+        # transaction, so details are fetched eventually whichever process
+        # or mode picks the job up.
+        if hashes:
+            await db.executemany(
                 """
-            INSERT OR IGNORE INTO new_releases (title, system, date, url, author, hash)
-            VALUES (?, ?, ?, ?, ?, ?)
+            INSERT OR IGNORE INTO enrichment_jobs (kind, item_hash, notify)
+            VALUES (?, ?, ?)
             """,
-                (
-                    item.title,
-                    item.system,
-                    item.date,
-                    item.url,
-                    item.author,
-                    item.hash,
-                ),
+                [(kind, item_hash, int(notify)) for item_hash in hashes],
             )
-            await db.commit()
-            return cursor.rowcount > 0
 
-    async def update_news_content(self, item_hash: str, content: str):
-        async with aiosqlite.connect(self.db_name) as db:
-            cursor = await db.cursor()
-            await cursor.execute(
+    async def retry_jobs(
+        self, db: aiosqlite.Connection, kind: str, hashes: List[bytes]
+    ):
+        # An item listed again while still missing its details gets another
+        # round of attempts if its job had given up, e.g. after an outage
+        # outlasted the retry backoff. The job keeps its notify flag, so the
+        # alert for a new item is still sent once it is enriched.
+        if hashes:
+            await db.executemany(
                 """
-            UPDATE news
-            SET content = ?
-            WHERE hash = ?
+            INSERT INTO enrichment_jobs (kind, item_hash) VALUES (?, ?)
+            ON CONFLICT (kind, item_hash) DO UPDATE
+            SET state = 'pending', attempts = 0, available_at = 0,
+                lease_owner = NULL, lease_expires = NULL
+            WHERE state = 'failed'
             """,
-                (content, item_hash),
+                [(kind, item_hash) for item_hash in hashes],
             )
-            await db.commit()
 
-    async def update_release_system(self, item_hash: str, system: str):
-        async with aiosqlite.connect(self.db_name) as db:
-            cursor = await db.cursor()
-            await cursor.execute(
-                """
-            UPDATE new_releases
-            SET system = ?
-            WHERE hash = ?
+    async def complete_jobs(
+        self, db: aiosqlite.Connection, kind: str, hashes: Iterable[bytes]
+    ):
+        await db.executemany(
+            "DELETE FROM enrichment_jobs WHERE kind = ? AND item_hash = ?",
+            [(kind, item_hash) for item_hash in hashes],
+        )
+
+    async def store_content(
+        self, db: aiosqlite.Connection, contents: Iterable[Optional[str]]
+    ) -> List[Optional[bytes]]:
+        packed = [pack_content(content) for content in contents]
+        blobs = {blob[0]: blob[1] for blob in packed if blob is not None}
+        if blobs:
+            await db.executemany(
+                "INSERT OR IGNORE INTO content_blobs (digest, data) VALUES (?, ?)",
+                blobs.items(),
+            )
+        return [blob[0] if blob is not None else None for blob in packed]
+
+    async def get_news_content(self, item_hash: bytes) -> Optional[str]:
+        result = await self.fetchone(
+            """
+        SELECT content_blobs.data
+        FROM news JOIN content_blobs ON content_blobs.digest = news.content_digest
+        WHERE news.hash = ?
+        """,
+            (item_hash,),
+        )
+        return unpack_content(result[0]) if result is not None else None
+
+    async def iter_latest_snapshots(
+        self, kinds: Iterable[str], batch_size: int = 100
+    ) -> AsyncIterator[List[Tuple[str, str, bytes]]]:
+        # Yields (url, kind, compressed body) for the newest snapshot of each
+        # URL, in batches, still compressed so the caller can fan the
+        # decompression out along with the parsing.
+        kinds = list(kinds)
+        db = await self.connect()
+        async with db.execute(
+            f"""
+        SELECT MAX(id) FROM page_snapshots
+        WHERE kind IN ({", ".join("?" * len(kinds))})
+        GROUP BY url
+        """,
+            kinds,
+        ) as cursor:
+            ids = [row[0] async for row in cursor]
+        batch_size = min(batch_size, self.MAX_BATCH_PARAMS)
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start : start + batch_size]
+            async with db.execute(
+                f"""
+            SELECT url, kind, content_blobs.data
+            FROM page_snapshots
+            JOIN content_blobs ON content_blobs.digest = page_snapshots.digest
+            WHERE page_snapshots.id IN ({", ".join("?" * len(chunk))})
             """,
-                (system, item_hash),
+                chunk,
+            ) as cursor:
+                yield list(await cursor.fetchall())
+
+    async def hashes_for_urls(
+        self, table: str, urls: Iterable[str]
+    ) -> Dict[str, List[bytes]]:
+        urls = list(dict.fromkeys(urls))
+        hashes: Dict[str, List[bytes]] = {}
+        db = await self.connect()
+        for start in range(0, len(urls), self.MAX_BATCH_PARAMS):
+            chunk = urls[start : start + self.MAX_BATCH_PARAMS]
+            placeholders = ", ".join("?" * len(chunk))
+            async with db.execute(
+                f"SELECT url, hash FROM {table} WHERE url IN ({placeholders})", chunk
+            ) as cursor:
+                async for url, item_hash in cursor:
+                    hashes.setdefault(url, []).append(item_hash)
+        return hashes
+
+    async def latest_news(
+        self, limit: int = 50
+    ) -> List[Tuple[str, str, str, Optional[str]]]:
+        db = await self.connect()
+        async with db.execute(
+            """
+        SELECT news.title, news.date, news.url, content_blobs.data
+        FROM news
+        LEFT JOIN content_blobs ON content_blobs.digest = news.content_digest
+        ORDER BY news.date DESC, news.id DESC
+        LIMIT ?
+        """,
+            (limit,),
+        ) as cursor:
+            return [
+                (title, date, url, unpack_content(data))
+                async for title, date, url, data in cursor
+            ]
+
+    async def latest_releases(
+        self, limit: int = 50
+    ) -> List[Tuple[str, str, str, Optional[str], Optional[str]]]:
+        db = await self.connect()
+        async with db.execute(
+            """
+        SELECT title, date, url, system, author
+        FROM new_releases
+        ORDER BY date DESC, id DESC
+        LIMIT ?
+        """,
+            (limit,),
+        ) as cursor:
+            return list(await cursor.fetchall())
+
+    async def data_version(self) -> int:
+        # Changes whenever another connection, possibly in another process,
+        # commits to the database.
+        result = await self.fetchone("PRAGMA data_version")
+        return result[0]
+
+    async def get_http_validators(self, url: str) -> Optional[HttpValidators]:
+        result = await self.fetchone(
+            "SELECT etag, last_modified, digest FROM http_cache WHERE url = ?",
+            (url,),
+        )
+        if result is None:
+            return None
+        return HttpValidators(url, *result)
+
+    async def get_source_state(self, name: str) -> SourceState:
+        result = await self.fetchone(
+            "SELECT last_change, mean_gap, interval FROM source_state WHERE name = ?",
+            (name,),
+        )
+        if result is None:
+            return SourceState(name)
+        return SourceState(name, *result)
+
+    async def save_source_state(self, state: SourceState):
+        await self.execute(
+            """
+        INSERT OR REPLACE INTO source_state (name, last_change, mean_gap, interval)
+        VALUES (?, ?, ?, ?)
+        """,
+            (state.name, state.last_change, state.mean_gap, state.interval),
+        )
+
+    async def get_backfill_state(self, name: str) -> BackfillState:
+        result = await self.fetchone(
+            "SELECT next_page, last_page, completed FROM backfill_state WHERE name = ?",
+            (name,),
+        )
+        if result is None:
+            return BackfillState(name)
+        next_page, last_page, completed = result
+        return BackfillState(name, next_page, last_page, bool(completed))
+
+    async def save_backfill_state(self, state: BackfillState):
+        await self.execute(
+            """
+        INSERT OR REPLACE INTO backfill_state
+            (name, next_page, last_page, completed, updated_at)
+        VALUES (?, ?, ?, ?, datetime('now'))
+        """,
+            (state.name, state.next_page, state.last_page, int(state.completed)),
+        )
+
+    async def insert_news(self, item: NewsItem):
+        result = await self.write_batch(WriteBatch(news=[item]))
+        return item.hash in result.inserted_news
+
+    async def insert_release(self, item: ReleaseItem):
+        result = await self.write_batch(WriteBatch(releases=[item]))
+        return item.hash in result.inserted_releases
+
+    async def update_news_content(self, item_hash: bytes, content: str):
+        await self.write_batch(WriteBatch(news_content={item_hash: content}))
+
+    async def update_release_system(self, item_hash: bytes, system: str):
+        await self.write_batch(WriteBatch(release_systems={item_hash: system}))
+
+    async def search(
+        self,
+        query: str,
+        kind: str = "all",
+        system: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> List[SearchResult]:
+        filters = ""
+        params: list = []
+        if since:
+            filters += " AND t.date >= ?"
+            params.append(since)
+        if until:
+            filters += " AND t.date <= ?"
+            params.append(until)
+
+        selects = []
+        select_params: list = []
+        # News has no system column, so a system filter only matches releases.
+        if kind in ("all", "news") and system is None:
+            selects.append(
+                f"""
+            SELECT 'news' AS kind, t.title, t.date, t.url, NULL, NULL,
+                snippet(news_fts, 1, '[', ']', '...', 12), bm25(news_fts) AS rank
+            FROM news_fts JOIN news t ON t.id = news_fts.rowid
+            WHERE news_fts MATCH ?{filters}
+            """
+            )
+            select_params += [query, *params]
+        if kind in ("all", "releases"):
+            system_filter = " AND t.system = ? COLLATE NOCASE" if system else ""
+            selects.append(
+                f"""
+            SELECT 'release' AS kind, t.title, t.date, t.url, t.system, t.author,
+                snippet(new_releases_fts, 0, '[', ']', '...', 12),
+                bm25(new_releases_fts) AS rank
+            FROM new_releases_fts JOIN new_releases t ON t.id = new_releases_fts.rowid
+            WHERE new_releases_fts MATCH ?{filters}{system_filter}
+            """
             )
-            await db.commit()
+            select_params += [query, *params] + ([system] if system else [])
+        if not selects:
+            return []
+
+        db = await self.connect()
+        with METRICS.timer("cryptkeeper_db_query_seconds", op="search"):
+            async with db.execute(
+                " UNION ALL ".join(selects) + " ORDER BY rank LIMIT ? OFFSET ?",
+                (*select_params, limit, offset),
+            ) as cursor:
+                return [SearchResult(*row) async for row in cursor]
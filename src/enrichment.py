@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+from typing import Dict, List, Set
+from src.database import DatabaseHandler
+from src.metrics import METRICS
+from src.models import EnrichmentJob, NewsItem, ReleaseItem
+from src.scrapers.homepage_scraper import HomepageScraper
+
+# Detail pages answering with these are gone for good; the item keeps the
+# placeholder instead of being retried.
+PERMANENT_STATUSES = {404, 410}
+
+
+class EnrichmentQueue:
+    def __init__(
+        self,
+        db_handler: DatabaseHandler,
+        lease_seconds: float = 300.0,
+        max_attempts: int = 5,
+        max_backoff: float = 3600.0,
+    ):
+        self.db_handler = db_handler
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+
+    async def claim(self, owner: str, limit: int) -> List[EnrichmentJob]:
+        now = time.time()
+        async with self.db_handler.transaction() as db:
+            # Taking SQLite's write lock before reading means two processes
+            # sharing the database can never claim the same row.
+            await db.execute("BEGIN IMMEDIATE")
+            await db.execute(
+                """
+            UPDATE enrichment_jobs
+            SET state = 'failed', lease_owner = NULL,
+                last_error = 'lease expired on the last attempt'
+            WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?
+            """,
+                (now, self.max_attempts),
+            )
+            async with db.execute(
+                """
+            SELECT id FROM enrichment_jobs
+            WHERE (state = 'pending' AND available_at <= ?)
+                OR (state = 'leased' AND lease_expires < ?)
+            ORDER BY id
+            LIMIT ?
+            """,
+                (now, now, limit),
+            ) as cursor:
+                ids = [row[0] async for row in cursor]
+            if not ids:
+                return []
+            await db.executemany(
+                """
+            UPDATE enrichment_jobs
+            SET state = 'leased', lease_owner = ?, lease_expires = ?,
+                attempts = attempts + 1
+            WHERE id = ?
+            """,
+                [(owner, now + self.lease_seconds, job_id) for job_id in ids],
+            )
+            placeholders = ", ".join("?" * len(ids))
+            async with db.execute(
+                f"""
+            SELECT j.id, j.kind, j.attempts, j.notify, n.title, n.date, n.url, NULL
+            FROM enrichment_jobs j JOIN news n ON n.hash = j.item_hash
+            WHERE j.kind = 'news' AND j.id IN ({placeholders})
+            UNION ALL
+            SELECT j.id, j.kind, j.attempts, j.notify, r.title, r.date, r.url, r.author
+            FROM enrichment_jobs j JOIN new_releases r ON r.hash = j.item_hash
+            WHERE j.kind = 'release' AND j.id IN ({placeholders})
+            """,
+                (*ids, *ids),
+            ) as cursor:
+                jobs = [self.build_job(*row) async for row in cursor]
+            # Jobs whose item has since been deleted have nothing to enrich.
+            orphans = set(ids) - {job.id for job in jobs}
+            await db.executemany(
+                "DELETE FROM enrichment_jobs WHERE id = ?",
+                [(job_id,) for job_id in orphans],
+            )
+        METRICS.inc("cryptkeeper_enrichment_jobs_claimed_total", len(jobs))
+        return jobs
+
+    @staticmethod
+    def build_job(job_id, kind, attempts, notify, title, date, url, author):
+        if kind == "news":
+            item = NewsItem(title=title, date=date, url=url)
+        else:
+            item = ReleaseItem(title=title, date=date, url=url, author=author)
+        return EnrichmentJob(job_id, kind, item, attempts, bool(notify))
+
+    async def extend(self, owner: str, job_ids: Set[int]):
+        if not job_ids:
+            return
+        async with self.db_handler.transaction() as db:
+            await db.executemany(
+                """
+            UPDATE enrichment_jobs SET lease_expires = ?
+            WHERE id = ? AND lease_owner = ? AND state = 'leased'
+            """,
+                [
+                    (time.time() + self.lease_seconds, job_id, owner)
+                    for job_id in job_ids
+                ],
+            )
+
+    async def fail(self, job: EnrichmentJob, owner: str, error: str):
+        delay = min(self.max_backoff, 30 * 2 ** (job.attempts - 1))
+        state = "failed" if job.attempts >= self.max_attempts else "pending"
+        await self.db_handler.execute(
+            """
+        UPDATE enrichment_jobs
+        SET state = ?, available_at = ?, lease_owner = NULL, lease_expires = NULL,
+            last_error = ?
+        WHERE id = ? AND lease_owner = ?
+        """,
+            (state, time.time() + delay, error, job.id, owner),
+        )
+        METRICS.inc("cryptkeeper_enrichment_jobs_failed_total", state=state)
+
+    async def counts(self) -> Dict[str, int]:
+        db = await self.db_handler.connect()
+        async with db.execute(
+            "SELECT state, COUNT(*) FROM enrichment_jobs GROUP BY state"
+        ) as cursor:
+            return {state: count async for state, count in cursor}
+
+
+class EnrichmentWorker:
+    def __init__(
+        self,
+        queue: EnrichmentQueue,
+        scraper: HomepageScraper,
+        name: str = "worker",
+        batch_size: int = 20,
+        poll_interval: float = 30.0,
+    ):
+        self.queue = queue
+        self.scraper = scraper
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{name}"
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.active: Set[int] = set()
+
+    async def run(self):
+        heartbeat = asyncio.create_task(self.heartbeat())
+        try:
+            while True:
+                try:
+                    claimed = await self.run_once()
+                except Exception:  # pylint: disable=broad-except
+                    # A locked database or a failed flush must not stop the
+                    # worker; unfinished jobs are claimed again later.
+                    logging.exception(f"Enrichment worker {self.owner} failed")
+                    claimed = 0
+                if not claimed:
+                    await asyncio.sleep(self.poll_interval)
+        finally:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+
+    async def heartbeat(self):
+        # Leases outlive a crashed worker by at most lease_seconds; a live
+        # one keeps extending them while its fetches are in flight.
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            try:
+                await self.queue.extend(self.owner, set(self.active))
+            except Exception:  # pylint: disable=broad-except
+                logging.exception(f"Could not extend leases for {self.owner}")
+
+    async def run_once(self) -> int:
+        jobs = await self.queue.claim(self.owner, self.batch_size)
+        if not jobs:
+            return 0
+        self.active.update(job.id for job in jobs)
+        try:
+            succeeded = await asyncio.gather(*[self.process(job) for job in jobs])
+        finally:
+            # Completed jobs are deleted in the same transaction that stores
+            # their details, including when shutdown interrupts the batch.
+            await self.scraper.write_buffer.flush()
+            self.active.difference_update(job.id for job in jobs)
+        done = [job for job, ok in zip(jobs, succeeded) if ok]
+        METRICS.inc("cryptkeeper_enrichment_jobs_completed_total", len(done))
+        news = [job.item for job in done if job.notify and job.kind == "news"]
+        releases = [job.item for job in done if job.notify and job.kind == "release"]
+        if news:
+            await self.scraper.send_news_notification(news)
+        if releases:
+            await self.scraper.send_releases_notification(releases)
+        logging.info(f"Enriched {len(done)} of {len(jobs)} claimed items")
+        return len(jobs)
+
+    async def process(self, job: EnrichmentJob) -> bool:
+        async with self.scraper.semaphore:
+            if job.kind == "news":
+                result = await self.scraper.fetch_news_content(job.item.url)
+            else:
+                result = await self.scraper.fetch_release_system(job.item.url)
+        if result.content is None and result.status not in PERMANENT_STATUSES:
+            await self.queue.fail(job, self.owner, f"fetch failed: {result.status}")
+            return False
+        if job.kind == "news":
+            await self.scraper.write_buffer.add_news_content(
+                job.item.hash, result.extracted, result.snapshot
+            )
+        else:
+            job.item.system = result.extracted
+            await self.scraper.write_buffer.add_release_system(
+                job.item.hash, result.extracted, result.snapshot
+            )
+        return True
@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from aiohttp import web
+from src.database import DatabaseHandler
+from src.feeds import render_atom, render_json, render_rss
+from src.metrics import METRICS
+from src.models import FeedEntry, WriteBatch, WriteResult
+
+FORMATS = {
+    "rss": ("application/rss+xml", render_rss),
+    "atom": ("application/atom+xml", render_atom),
+    "json": ("application/feed+json", render_json),
+}
+FEEDS = {
+    "news": "Hidden Palace News",
+    "releases": "Hidden Palace Community Releases",
+}
+
+
+@dataclass
+class RenderedFeed:
+    body: bytes
+    content_type: str
+    etag: str
+
+
+class FeedServer:
+    def __init__(
+        self,
+        db_handler: DatabaseHandler,
+        port: int,
+        host: str = "127.0.0.1",
+        public_url: Optional[str] = None,
+        site_url: str = "",
+        limit: int = 50,
+        max_age: int = 60,
+        recheck_seconds: float = 5.0,
+    ):
+        self.db_handler = db_handler
+        self.host = host
+        self.port = port
+        self.public_url = (public_url or f"http://{host}:{port}").rstrip("/")
+        self.site_url = site_url
+        self.limit = limit
+        self.max_age = max_age
+        self.recheck_seconds = recheck_seconds
+        self.entries: Dict[str, List[FeedEntry]] = {}
+        self.rendered: Dict[Tuple[str, str], RenderedFeed] = {}
+        self.generations: Dict[str, int] = {feed: 0 for feed in FEEDS}
+        self.render_lock = asyncio.Lock()
+        self.data_version: Optional[int] = None
+        self.checked_at = 0.0
+        self.runner: Optional[web.AppRunner] = None
+        db_handler.write_listeners.append(self.invalidate)
+
+    def invalidate(self, batch: WriteBatch, result: WriteResult):
+        # Re-rendering waits for the next request; batches that only touched
+        # items already in the feeds' tables with nothing new keep the cache.
+        if result.inserted_news or batch.news_content:
+            self.drop("news")
+        if result.inserted_releases or batch.release_systems:
+            self.drop("releases")
+
+    def drop(self, feed: str):
+        self.generations[feed] += 1
+        self.entries.pop(feed, None)
+        for key in [key for key in self.rendered if key[0] == feed]:
+            del self.rendered[key]
+
+    async def check_external_writes(self):
+        # Writes from other processes sharing the database (enrichment
+        # workers, backfills) never reach invalidate, so the cache also
+        # watches SQLite's data_version, at most once per recheck interval.
+        now = time.monotonic()
+        if now - self.checked_at < self.recheck_seconds:
+            return
+        self.checked_at = now
+        version = await self.db_handler.data_version()
+        if self.data_version is not None and version != self.data_version:
+            for feed in FEEDS:
+                self.drop(feed)
+        self.data_version = version
+
+    async def load_entries(self, feed: str) -> List[FeedEntry]:
+        if feed == "news":
+            return [
+                FeedEntry(title, url, date, content)
+                for title, date, url, content in await self.db_handler.latest_news(
+                    self.limit
+                )
+            ]
+        return [
+            FeedEntry(
+                title,
+                url,
+                date,
+                f"{system or 'Unknown system'} release by {author or 'Unknown'}",
+            )
+            for title, date, url, system, author in await self.db_handler.latest_releases(
+                self.limit
+            )
+        ]
+
+    async def render(self, feed: str, fmt: str) -> RenderedFeed:
+        await self.check_external_writes()
+        rendered = self.rendered.get((feed, fmt))
+        if rendered is not None:
+            return rendered
+        async with self.render_lock:
+            # Concurrent pollers that missed the cache wait here for a single
+            # render instead of each querying SQLite.
+            rendered = self.rendered.get((feed, fmt))
+            if rendered is not None:
+                return rendered
+            generation = self.generations[feed]
+            entries = self.entries.get(feed)
+            if entries is None:
+                entries = await self.load_entries(feed)
+            content_type, renderer = FORMATS[fmt]
+            body = renderer(
+                FEEDS[feed],
+                self.site_url,
+                f"{self.public_url}/{feed}.{fmt}",
+                entries,
+            )
+            etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+            rendered = RenderedFeed(body, content_type, etag)
+            # A write committed while the query was in flight already found
+            # nothing to drop; serve this render once but do not cache it.
+            if self.generations[feed] == generation:
+                self.entries[feed] = entries
+                self.rendered[(feed, fmt)] = rendered
+            METRICS.inc("cryptkeeper_feed_renders_total", feed=feed, format=fmt)
+            return rendered
+
+    async def handle_feed(self, request):
+        feed = request.match_info["feed"]
+        fmt = request.match_info["fmt"]
+        if feed not in FEEDS or fmt not in FORMATS:
+            raise web.HTTPNotFound()
+        rendered = await self.render(feed, fmt)
+        headers = {
+            "ETag": rendered.etag,
+            "Cache-Control": f"public, max-age={self.max_age}",
+        }
+        if_none_match = request.headers.get("If-None-Match", "")
+        tags = {tag.strip() for tag in if_none_match.split(",")}
+        if rendered.etag in tags or "*" in tags:
+            METRICS.inc("cryptkeeper_feed_requests_total", feed=feed, status=304)
+            return web.Response(status=304, headers=headers)
+        METRICS.inc("cryptkeeper_feed_requests_total", feed=feed, status=200)
+        return web.Response(
+            body=rendered.body,
+            content_type=rendered.content_type,
+            charset="utf-8",
+            headers=headers,
+        )
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/{feed}.{fmt}", self.handle_feed)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        logging.info(f"Serving feeds on {self.public_url}/news.rss")
+
+    async def close(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
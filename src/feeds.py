@@ -0,0 +1,94 @@
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import List, Optional
+from xml.etree.ElementTree import Element, SubElement, tostring
+from src.models import FeedEntry
+
+ATOM_NS = "http://www.w3.org/2005/Atom"
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def parse_date(date: str) -> Optional[datetime]:
+    try:
+        return datetime.strptime(date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def newest(entries: List[FeedEntry]) -> datetime:
+    dates = [parse_date(entry.date) for entry in entries]
+    return max((date for date in dates if date is not None), default=EPOCH)
+
+
+def render_rss(
+    title: str, site_url: str, feed_url: str, entries: List[FeedEntry]
+) -> bytes:
+    rss = Element("rss", {"version": "2.0", "xmlns:atom": ATOM_NS})
+    channel = SubElement(rss, "channel")
+    SubElement(channel, "title").text = title
+    SubElement(channel, "link").text = site_url
+    SubElement(channel, "description").text = title
+    SubElement(
+        channel,
+        "atom:link",
+        {"href": feed_url, "rel": "self", "type": "application/rss+xml"},
+    )
+    SubElement(channel, "lastBuildDate").text = format_datetime(newest(entries))
+    for entry in entries:
+        item = SubElement(channel, "item")
+        SubElement(item, "title").text = entry.title
+        SubElement(item, "link").text = entry.url
+        SubElement(item, "guid", {"isPermaLink": "true"}).text = entry.url
+        published = parse_date(entry.date)
+        if published is not None:
+            SubElement(item, "pubDate").text = format_datetime(published)
+        if entry.summary:
+            SubElement(item, "description").text = entry.summary
+    return tostring(rss, encoding="utf-8", xml_declaration=True)
+
+
+def render_atom(
+    title: str, site_url: str, feed_url: str, entries: List[FeedEntry]
+) -> bytes:
+    updated = newest(entries)
+    feed = Element("feed", {"xmlns": ATOM_NS})
+    SubElement(feed, "id").text = feed_url
+    SubElement(feed, "title").text = title
+    SubElement(feed, "updated").text = updated.isoformat()
+    SubElement(feed, "link", {"href": feed_url, "rel": "self"})
+    SubElement(feed, "link", {"href": site_url})
+    for entry in entries:
+        item = SubElement(feed, "entry")
+        SubElement(item, "id").text = entry.url
+        SubElement(item, "title").text = entry.title
+        SubElement(item, "link", {"href": entry.url})
+        SubElement(item, "updated").text = (
+            parse_date(entry.date) or updated
+        ).isoformat()
+        if entry.summary:
+            SubElement(item, "summary").text = entry.summary
+    return tostring(feed, encoding="utf-8", xml_declaration=True)
+
+
+def render_json(
+    title: str, site_url: str, feed_url: str, entries: List[FeedEntry]
+) -> bytes:
+    items = []
+    for entry in entries:
+        item = {"id": entry.url, "url": entry.url, "title": entry.title}
+        published = parse_date(entry.date)
+        if published is not None:
+            item["date_published"] = published.isoformat()
+        item["content_text"] = entry.summary or entry.title
+        items.append(item)
+    return json.dumps(
+        {
+            "version": "https://jsonfeed.org/version/1.1",
+            "title": title,
+            "home_page_url": site_url,
+            "feed_url": feed_url,
+            "items": items,
+        },
+        ensure_ascii=False,
+    ).encode()
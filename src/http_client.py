@@ -0,0 +1,62 @@
+from typing import Optional
+import aiohttp
+from src.config import Config
+
+
+class HttpClient:
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 10,
+        dns_cache_seconds: int = 300,
+        keepalive_seconds: float = 30.0,
+        total_timeout: float = 60.0,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 30.0,
+        user_agent: Optional[str] = None,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_seconds = dns_cache_seconds
+        self.keepalive_seconds = keepalive_seconds
+        self.timeout = aiohttp.ClientTimeout(
+            total=total_timeout, connect=connect_timeout, sock_read=read_timeout
+        )
+        self.user_agent = user_agent
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @classmethod
+    def from_config(cls, config: Config) -> "HttpClient":
+        return cls(
+            limit=config.getint("HTTP", "limit", 100),
+            limit_per_host=config.getint("HTTP", "limit_per_host", 10),
+            dns_cache_seconds=config.getint("HTTP", "dns_cache_seconds", 300),
+            keepalive_seconds=config.getfloat("HTTP", "keepalive_seconds", 30.0),
+            total_timeout=config.getfloat("HTTP", "total_timeout", 60.0),
+            connect_timeout=config.getfloat("HTTP", "connect_timeout", 10.0),
+            read_timeout=config.getfloat("HTTP", "read_timeout", 30.0),
+            user_agent=config.get("HTTP", "user_agent"),
+        )
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # Created lazily because aiohttp sessions must be built inside the
+        # running event loop. aiohttp advertises and decodes gzip, deflate
+        # and, with Brotli from requirements.txt installed, br.
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_cache_seconds,
+                keepalive_timeout=self.keepalive_seconds,
+            )
+            headers = {"User-Agent": self.user_agent} if self.user_agent else None
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=self.timeout, headers=headers
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
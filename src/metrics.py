@@ -0,0 +1,154 @@
+import bisect
+import json
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def make_labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{escape_label_value(v)}"' for k, v in pairs) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self.help: Dict[str, str] = {}
+
+    def describe(self, name: str, text: str):
+        self.help[name] = text
+
+    def inc(self, name: str, value: float = 1, **labels):
+        series = self.counters.setdefault(name, {})
+        key = make_labels(labels)
+        series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        series = self.histograms.setdefault(name, {})
+        key = make_labels(labels)
+        if key not in series:
+            series[key] = Histogram()
+        series[key].observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        for name, series in sorted(self.counters.items()):
+            if name in self.help:
+                lines.append(f"# HELP {name} {self.help[name]}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in sorted(series.items()):
+                lines.append(f"{name}{format_labels(labels)} {value}")
+        for name, series in sorted(self.histograms.items()):
+            if name in self.help:
+                lines.append(f"# HELP {name} {self.help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    le = format_labels(labels, ("le", str(bound)))
+                    lines.append(f"{name}_bucket{le} {cumulative}")
+                le = format_labels(labels, ("le", "+Inf"))
+                lines.append(f"{name}_bucket{le} {histogram.count}")
+                lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        return {
+            "counters": {
+                name: [
+                    {"labels": dict(labels), "value": value}
+                    for labels, value in series.items()
+                ]
+                for name, series in self.counters.items()
+            },
+            "histograms": {
+                name: [
+                    {
+                        "labels": dict(labels),
+                        "count": histogram.count,
+                        "sum": histogram.sum,
+                        "buckets": dict(
+                            zip(map(str, histogram.buckets), histogram.counts)
+                        ),
+                    }
+                    for labels, histogram in series.items()
+                ]
+                for name, series in self.histograms.items()
+            },
+        }
+
+    def dump_json(self, path: str):
+        with open(path, "w", encoding="utf-8") as fp:
+            json.dump(self.snapshot(), fp, indent=2)
+
+
+# Process-wide registry; components record into it the same way they log.
+METRICS = MetricsRegistry()
+
+DESCRIPTIONS = {
+    "cryptkeeper_backfill_pages_total": "Archive listing pages stored by backfills.",
+    "cryptkeeper_cycle_seconds": "Duration of a scrape cycle per source.",
+    "cryptkeeper_db_batch_rows_total": "Rows written by batched database writes.",
+    "cryptkeeper_db_commit_seconds": "Time spent committing batched writes.",
+    "cryptkeeper_db_query_seconds": "Duration of database queries.",
+    "cryptkeeper_enrichment_jobs_claimed_total": "Enrichment jobs leased by workers.",
+    "cryptkeeper_enrichment_jobs_completed_total": "Enrichment jobs completed.",
+    "cryptkeeper_enrichment_jobs_failed_total": "Enrichment job attempts that failed.",
+    "cryptkeeper_feed_renders_total": "Feeds rendered into the feed cache.",
+    "cryptkeeper_feed_requests_total": "Feed requests served, by status.",
+    "cryptkeeper_fetch_seconds": "Duration of HTTP fetches per host.",
+    "cryptkeeper_http_bytes_total": "Response body bytes read per host.",
+    "cryptkeeper_http_cache_hits_total": "Fetches skipped as not modified or unchanged.",
+    "cryptkeeper_http_cache_misses_total": "Conditional fetches whose page changed.",
+    "cryptkeeper_http_errors_total": "HTTP requests that failed without a response.",
+    "cryptkeeper_http_responses_total": "HTTP responses per host and status.",
+    "cryptkeeper_http_stream_early_stops_total": "Streamed bodies not read to the end.",
+    "cryptkeeper_items_total": "Listed items by kind and enrichment state.",
+    "cryptkeeper_new_items_total": "New items found per source.",
+    "cryptkeeper_notification_rate_limited_total": "Notifications held by the rate limit.",
+    "cryptkeeper_notification_send_seconds": "Duration of Pushover requests.",
+    "cryptkeeper_notification_tracking_flush_seconds": "Time spent saving send times.",
+    "cryptkeeper_notifications_total": "Notification sends by result.",
+    "cryptkeeper_parse_seconds": "Duration of HTML parsing per parser function.",
+    "cryptkeeper_rate_limit_wait_seconds": "Time spent waiting on the host rate limit.",
+    "cryptkeeper_reparse_batch_seconds": "Duration of parsing one reparse batch.",
+}
+METRICS.help.update(DESCRIPTIONS)
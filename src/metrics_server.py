@@ -0,0 +1,41 @@
+import logging
+from typing import Optional
+from aiohttp import web
+from src.metrics import METRICS, MetricsRegistry
+
+
+class MetricsServer:
+    def __init__(
+        self,
+        port: int,
+        host: str = "127.0.0.1",
+        registry: MetricsRegistry = METRICS,
+    ):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self.runner: Optional[web.AppRunner] = None
+
+    async def handle_metrics(self, request):
+        return web.Response(
+            text=self.registry.render_prometheus(),
+            content_type="text/plain",
+            headers={"X-Content-Type-Options": "nosniff"},
+        )
+
+    async def handle_json(self, request):
+        return web.json_response(self.registry.snapshot())
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle_metrics)
+        app.router.add_get("/metrics.json", self.handle_json)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        logging.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def close(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
@@ -0,0 +1,426 @@
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List
+import aiosqlite
+
+
+@dataclass(slots=True)
+class Migration:
+    version: int
+    description: str
+    apply: Callable[[aiosqlite.Connection], Awaitable[None]]
+    # Migrations that rewrite large tables leave free pages behind; a VACUUM
+    # after the upgrade returns them to the filesystem.
+    vacuum: bool = False
+
+
+# Migrations run in order, each in its own transaction, and must never be
+# edited once released: databases that predate schema_version start at 0 and
+# may already be in the state a migration produces, so every step checks
+# before it changes anything.
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, description: str, vacuum: bool = False):
+    def register(apply: Callable[[aiosqlite.Connection], Awaitable[None]]):
+        MIGRATIONS.append(Migration(version, description, apply, vacuum))
+        return apply
+
+    return register
+
+
+async def table_exists(db: aiosqlite.Connection, name: str) -> bool:
+    async with db.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = ?", (name,)
+    ) as cursor:
+        return await cursor.fetchone() is not None
+
+
+async def column_types(db: aiosqlite.Connection, table: str) -> Dict[str, str]:
+    async with db.execute(f"PRAGMA table_info({table})") as cursor:
+        return {row[1]: row[2] async for row in cursor}
+
+
+async def create_search_index(
+    db: aiosqlite.Connection,
+    fts_table: str,
+    table: str,
+    source: str,
+    columns: Dict[str, str],
+):
+    # External-content FTS5 tables mirror the archive tables through triggers,
+    # so every insert/update path keeps the index current without extra
+    # statements in Python. `columns` maps each indexed column to the SQL
+    # that reads it from a `{row}` of `table`; `source` is what FTS5 reads
+    # back for snippets and rebuilds.
+    if await table_exists(db, fts_table):
+        return
+    column_list = ", ".join(columns)
+    new_values = ", ".join(expr.format(row="new") for expr in columns.values())
+    old_values = ", ".join(expr.format(row="old") for expr in columns.values())
+    await db.execute(
+        f"""
+    CREATE VIRTUAL TABLE {fts_table} USING fts5(
+        {column_list},
+        content='{source}',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """
+    )
+    await db.execute(
+        f"""
+    CREATE TRIGGER IF NOT EXISTS {fts_table}_insert AFTER INSERT ON {table} BEGIN
+        INSERT INTO {fts_table} (rowid, {column_list})
+        VALUES (new.id, {new_values});
+    END
+    """
+    )
+    await db.execute(
+        f"""
+    CREATE TRIGGER IF NOT EXISTS {fts_table}_delete AFTER DELETE ON {table} BEGIN
+        INSERT INTO {fts_table} ({fts_table}, rowid, {column_list})
+        VALUES ('delete', old.id, {old_values});
+    END
+    """
+    )
+    await db.execute(
+        f"""
+    CREATE TRIGGER IF NOT EXISTS {fts_table}_update AFTER UPDATE ON {table} BEGIN
+        INSERT INTO {fts_table} ({fts_table}, rowid, {column_list})
+        VALUES ('delete', old.id, {old_values});
+        INSERT INTO {fts_table} (rowid, {column_list})
+        VALUES (new.id, {new_values});
+    END
+    """
+    )
+    # Index whatever the archive already holds.
+    await db.execute(f"INSERT INTO {fts_table} ({fts_table}) VALUES ('rebuild')")
+
+
+async def drop_search_index(db: aiosqlite.Connection, fts_table: str):
+    for trigger in ("insert", "delete", "update"):
+        await db.execute(f"DROP TRIGGER IF EXISTS {fts_table}_{trigger}")
+    await db.execute(f"DROP TABLE IF EXISTS {fts_table}")
+
+
+@migration(1, "archive, http cache and source state tables")
+async def create_base_tables(db: aiosqlite.Connection):
+    await db.execute(
+        """
+    CREATE TABLE IF NOT EXISTS news (
+        id INTEGER PRIMARY KEY,
+        title TEXT NOT NULL,
+        content TEXT,
+        date TEXT NOT NULL,
+        url TEXT NOT NULL,
+        hash BLOB UNIQUE NOT NULL
+    )
+    """
+    )
+    await db.execute(
+        """
+    CREATE TABLE IF NOT EXISTS new_releases (
+        id INTEGER PRIMARY KEY,
+        title TEXT NOT NULL,
+        system TEXT,
+        date TEXT NOT NULL,
+        url TEXT NOT NULL,
+        author TEXT,
+        hash BLOB UNIQUE NOT NULL
+    )
+    """
+    )
+    await db.execute(
+        """
+    CREATE TABLE IF NOT EXISTS http_cache (
+        url TEXT PRIMARY KEY,
+        etag TEXT,
+        last_modified TEXT,
+        digest TEXT,
+        updated_at TEXT NOT NULL
+    )
+    """
+    )
+    await db.execute(
+        """
+    CREATE TABLE IF NOT EXISTS source_state (
+        name TEXT PRIMARY KEY,
+        last_change REAL,
+        mean_gap REAL,
+        interval REAL
+    )
+    """
+    )
+
+
+@migration(2, "16-byte binary item hashes", vacuum=True)
+async def migrate_hash_keys(db: aiosqlite.Connection):
+    # Databases written before hashes became 16-byte BLOBs hold MD5 hex TEXT
+    # keys. Both were derived from title, url and date, so the new keys can be
+    # recomputed from the stored rows.
+    for table, columns in (
+        ("news", "title, content, date, url"),
+        ("new_releases", "title, system, date, url, author"),
+    ):
+        if (await column_types(db, table)).get("hash") != "TEXT":
+            continue
+        async with db.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (table,),
+        ) as cursor:
+            (create_sql,) = await cursor.fetchone()
+        logging.info(f"Migrating {table} hashes to binary keys")
+        await db.execute(
+            create_sql.replace(f"TABLE {table}", f"TABLE {table}_migrated", 1).replace(
+                "hash TEXT UNIQUE NOT NULL", "hash BLOB UNIQUE NOT NULL"
+            )
+        )
+        await db.execute(
+            f"""
+        INSERT INTO {table}_migrated (id, {columns}, hash)
+        SELECT id, {columns}, item_hash(title, url, date) FROM {table}
+        """
+        )
+        # Dropping the table also drops its search triggers; the search
+        # migration rebuilds the index over the unchanged row ids.
+        await db.execute(f"DROP TABLE {table}")
+        await drop_search_index(db, f"{table}_fts")
+        await db.execute(f"ALTER TABLE {table}_migrated RENAME TO {table}")
+
+
+@migration(3, "full-text search over news and releases")
+async def create_search_indexes(db: aiosqlite.Connection):
+    await create_search_index(
+        db,
+        "news_fts",
+        "news",
+        "news",
+        {"title": "{row}.title", "content": "{row}.content"},
+    )
+    await create_search_index(
+        db,
+        "new_releases_fts",
+        "new_releases",
+        "new_releases",
+        {"title": "{row}.title", "system": "{row}.system", "author": "{row}.author"},
+    )
+
+
+@migration(4, "date and system indexes")
+async def create_date_indexes(db: aiosqlite.Connection):
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_news_date ON news (date)")
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_new_releases_date ON new_releases (date)"
+    )
+    await db.execute(
+        """
+    CREATE INDEX IF NOT EXISTS idx_new_releases_system
+    ON new_releases (system COLLATE NOCASE, date)
+    """
+    )
+
+
+@migration(5, "compressed, content-addressed news bodies", vacuum=True)
+async def store_content_blobs(db: aiosqlite.Connection):
+    # Bodies move to content_blobs keyed by their blake2b digest, so repeated
+    # bodies (the "Error fetching news content" placeholder above all) are
+    # stored once, zlib-compressed. Empty bodies become NULL digests, which
+    # still mark the item as missing its content.
+    await db.execute(
+        """
+    CREATE TABLE IF NOT EXISTS content_blobs (
+        digest BLOB PRIMARY KEY,
+        data BLOB NOT NULL
+    ) WITHOUT ROWID
+    """
+    )
+    if "content" not in await column_types(db, "news"):
+        return
+    await db.execute(
+        """
+    INSERT OR IGNORE INTO content_blobs (digest, data)
+    SELECT content_digest(content), deflate(content)
+    FROM news
+    WHERE content IS NOT NULL AND content != ''
+    """
+    )
+    await drop_search_index(db, "news_fts")
+    await db.execute(
+        """
+    CREATE TABLE news_migrated (
+        id INTEGER PRIMARY KEY,
+        title TEXT NOT NULL,
+        content_digest BLOB REFERENCES content_blobs (digest),
+        date TEXT NOT NULL,
+        url TEXT NOT NULL,
+        hash BLOB UNIQUE NOT NULL
+    )
+    """
+    )
+    await db.execute(
+        """
+    INSERT INTO news_migrated (id, title, content_digest, date, url, hash)
+    SELECT id, title, CASE WHEN content != '' THEN content_digest(content) END,
+        date, url, hash
+    FROM news
+    """
+    )
+    await db.execute("DROP TABLE news")
+    await db.execute("ALTER TABLE news_migrated RENAME TO news")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_news_date ON news (date)")
+    # FTS5 reads bodies back through this view when it builds snippets.
+    await db.execute(
+        """
+    CREATE VIEW IF NOT EXISTS news_text AS
+    SELECT news.id, news.title, inflate(content_blobs.data) AS content
+    FROM news LEFT JOIN content_blobs ON content_blobs.digest = news.content_digest
+    """
+    )
+    await create_search_index(
+        db,
+        "news_fts",
+        "news",
+        "news_text",
+        {
+            "title": "{row}.title",
+            "content": (
+                "inflate((SELECT data FROM content_blobs"
+                " WHERE digest = {row}.content_digest))"
+            ),
+        },
+    )
+
+
+@migration(6, "backfill checkpoints")
+async def create_backfill_state(db: aiosqlite.Connection):
+    await db.execute(
+        """
+    CREATE TABLE IF NOT EXISTS backfill_state (
+        name TEXT PRIMARY KEY,
+        next_page INTEGER NOT NULL,
+        last_page INTEGER,
+        completed INTEGER NOT NULL DEFAULT 0,
+        updated_at TEXT NOT NULL
+    )
+    """
+    )
+
+
+@migration(7, "raw page snapshots")
+async def create_page_snapshots(db: aiosqlite.Connection):
+    # Page bodies share content_blobs with news bodies, so a page fetched
+    # again unchanged only costs one small metadata row.
+    await db.execute(
+        """
+    CREATE TABLE IF NOT EXISTS page_snapshots (
+        id INTEGER PRIMARY KEY,
+        url TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        digest BLOB NOT NULL REFERENCES content_blobs (digest),
+        fetched_at TEXT NOT NULL
+    )
+    """
+    )
+    await db.execute(
+        """
+    CREATE INDEX IF NOT EXISTS idx_page_snapshots_url
+    ON page_snapshots (url, fetched_at)
+    """
+    )
+
+
+@migration(8, "enrichment job queue")
+async def create_enrichment_jobs(db: aiosqlite.Connection):
+    await db.execute(
+        """
+    CREATE TABLE IF NOT EXISTS enrichment_jobs (
+        id INTEGER PRIMARY KEY,
+        kind TEXT NOT NULL,
+        item_hash BLOB NOT NULL,
+        notify INTEGER NOT NULL DEFAULT 0,
+        state TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        available_at REAL NOT NULL DEFAULT 0,
+        lease_owner TEXT,
+        lease_expires REAL,
+        last_error TEXT,
+        UNIQUE (kind, item_hash)
+    )
+    """
+    )
+    await db.execute(
+        """
+    CREATE INDEX IF NOT EXISTS idx_enrichment_jobs_state
+    ON enrichment_jobs (state, available_at)
+    """
+    )
+    # Items left without details by an earlier crash get a job, so nothing
+    # depends on them reappearing on the homepage.
+    await db.execute(
+        """
+    INSERT OR IGNORE INTO enrichment_jobs (kind, item_hash)
+    SELECT 'news', hash FROM news WHERE content_digest IS NULL
+    """
+    )
+    await db.execute(
+        """
+    INSERT OR IGNORE INTO enrichment_jobs (kind, item_hash)
+    SELECT 'release', hash FROM new_releases WHERE system IS NULL OR system = ''
+    """
+    )
+
+
+@migration(9, "notification tracking, outbox and dead-letter tables")
+async def create_notification_tables(db: aiosqlite.Connection):
+    # Older databases already have the first three, created on startup by
+    # the notification classes before they were part of the schema.
+    await db.execute(
+        """
+    CREATE TABLE IF NOT EXISTS notification_tracking (
+        id INTEGER PRIMARY KEY,
+        timestamp TEXT NOT NULL
+    )
+    """
+    )
+    await db.execute(
+        """
+    CREATE INDEX IF NOT EXISTS idx_notification_tracking_timestamp
+    ON notification_tracking (timestamp)
+    """
+    )
+    await db.execute(
+        """
+    CREATE TABLE IF NOT EXISTS notification_outbox (
+        id INTEGER PRIMARY KEY,
+        kind TEXT,
+        title TEXT NOT NULL,
+        header TEXT,
+        body TEXT NOT NULL,
+        html INTEGER NOT NULL DEFAULT 0,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at TEXT NOT NULL
+    )
+    """
+    )
+    await db.execute(
+        """
+    CREATE INDEX IF NOT EXISTS idx_notification_outbox_next_attempt
+    ON notification_outbox (next_attempt_at)
+    """
+    )
+    await db.execute(
+        """
+    CREATE TABLE IF NOT EXISTS notification_dead_letters (
+        id INTEGER PRIMARY KEY,
+        kind TEXT,
+        title TEXT NOT NULL,
+        header TEXT,
+        body TEXT NOT NULL,
+        html INTEGER NOT NULL DEFAULT 0,
+        attempts INTEGER NOT NULL,
+        error TEXT NOT NULL,
+        failed_at TEXT NOT NULL
+    )
+    """
+    )
@@ -1,21 +1,155 @@
+import hashlib
+import time
 from dataclasses import dataclass, field
-from typing import Optional
+from typing import Dict, List, Optional, Set, Union
 
 
-@dataclass
+def item_hash(title: str, url: str, date: str) -> bytes:
+    # 16-byte keys are stored as BLOBs, half the size of the old MD5 hex text.
+    return hashlib.blake2b(f"{title}_{url}_{date}".encode(), digest_size=16).digest()
+
+
+@dataclass(slots=True)
 class NewsItem:
     title: str
     date: str
     url: str
-    hash: Optional[str] = field(default=None, init=False)
+    hash: bytes = field(init=False)
     content: Optional[str] = field(default=None, init=False)
 
+    def __post_init__(self):
+        self.hash = item_hash(self.title, self.url, self.date)
+
 
-@dataclass
+@dataclass(slots=True)
 class ReleaseItem:
     title: str
     date: str
     url: str
     author: str
     system: Optional[str] = field(default=None, init=False)
-    hash: Optional[str] = field(default=None, init=False)
+    hash: bytes = field(init=False)
+
+    def __post_init__(self):
+        self.hash = item_hash(self.title, self.url, self.date)
+
+
+@dataclass(slots=True)
+class HashStatus:
+    unknown: Set[bytes] = field(default_factory=set)
+    incomplete: Set[bytes] = field(default_factory=set)
+    done: Set[bytes] = field(default_factory=set)
+
+    def needs_work(self, key: bytes) -> bool:
+        return key not in self.done
+
+
+@dataclass(slots=True)
+class HttpValidators:
+    url: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    digest: Optional[str] = None
+
+    def request_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+@dataclass(slots=True)
+class PageSnapshot:
+    url: str
+    kind: str
+    content: str
+    fetched_at: str = field(
+        default_factory=lambda: time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+    )
+
+
+@dataclass(slots=True)
+class FetchResult:
+    url: str
+    content: Optional[str] = None
+    status: Optional[int] = None
+    unchanged: bool = False
+    validators: Optional[HttpValidators] = None
+    extracted: Optional[str] = None
+    snapshot: Optional[PageSnapshot] = None
+
+
+@dataclass(slots=True)
+class WriteBatch:
+    news: List[NewsItem] = field(default_factory=list)
+    releases: List[ReleaseItem] = field(default_factory=list)
+    news_content: Dict[bytes, str] = field(default_factory=dict)
+    release_systems: Dict[bytes, str] = field(default_factory=dict)
+    validators: Dict[str, HttpValidators] = field(default_factory=dict)
+    snapshots: List[PageSnapshot] = field(default_factory=list)
+    # Copied onto the enrichment jobs of newly inserted items, so the worker
+    # that completes a job announces the item.
+    notify_new: bool = False
+
+    def __len__(self) -> int:
+        return (
+            len(self.news)
+            + len(self.releases)
+            + len(self.news_content)
+            + len(self.release_systems)
+            + len(self.validators)
+            + len(self.snapshots)
+        )
+
+
+@dataclass(slots=True)
+class WriteResult:
+    inserted_news: Set[bytes] = field(default_factory=set)
+    inserted_releases: Set[bytes] = field(default_factory=set)
+
+
+@dataclass(slots=True)
+class SourceState:
+    name: str
+    last_change: Optional[float] = None
+    mean_gap: Optional[float] = None
+    interval: Optional[float] = None
+
+
+@dataclass(slots=True)
+class BackfillState:
+    name: str
+    next_page: int = 1
+    last_page: Optional[int] = None
+    completed: bool = False
+
+
+@dataclass(slots=True)
+class EnrichmentJob:
+    id: int
+    kind: str
+    item: Union[NewsItem, ReleaseItem]
+    attempts: int
+    notify: bool
+
+
+@dataclass(slots=True)
+class SearchResult:
+    kind: str
+    title: str
+    date: str
+    url: str
+    system: Optional[str]
+    author: Optional[str]
+    snippet: str
+    rank: float
+
+
+@dataclass(slots=True)
+class FeedEntry:
+    title: str
+    url: str
+    date: str
+    summary: Optional[str] = None
@@ -1,12 +1,55 @@
-from typing import Dict
-from .notification_tracking import send_rate_limited_notification
+from datetime import timedelta
+from typing import Dict, List, Optional
+from src.database import DatabaseHandler
+from src.http_client import HttpClient
+from .notification_tracking import NotificationRateLimiter
+from .outbox import NotificationOutbox
+from .pushover_integration import PushoverClient
 
 
 class NotificationManager:
-    def __init__(self, pushover_config: Dict[str, str]):
+    def __init__(
+        self,
+        pushover_config: Dict[str, str],
+        db_handler: DatabaseHandler,
+        limit: int = 10,
+        window: timedelta = timedelta(hours=1),
+        max_digest_entries: int = 20,
+        http_client: Optional[HttpClient] = None,
+    ):
         self.pushover_config = pushover_config
+        self.db_handler = db_handler
+        self.rate_limiter = NotificationRateLimiter(db_handler, limit, window)
+        self.outbox = NotificationOutbox(
+            db_handler,
+            self.rate_limiter,
+            PushoverClient(pushover_config, http_client),
+            max_digest_entries=max_digest_entries,
+        )
+
+    async def setup(self):
+        await self.rate_limiter.setup()
+
+    def start(self):
+        self.outbox.start()
+
+    async def deliver(self):
+        # Sends whatever is due once, for runs without the background task.
+        await self.outbox.drain()
 
     async def send_notification(self, title: str, message: str, html: int = 0):
-        await send_rate_limited_notification(
-            title, message, self.pushover_config, html=html
-        )
+        await self.outbox.enqueue(title, [message], html=html)
+
+    async def send_digest(
+        self,
+        kind: str,
+        title: str,
+        entries: List[str],
+        header: Optional[str] = None,
+        html: int = 0,
+    ):
+        await self.outbox.enqueue(title, entries, html=html, kind=kind, header=header)
+
+    async def close(self):
+        await self.outbox.close()
+        await self.rate_limiter.close()
@@ -1,80 +1,93 @@
-import aiosqlite
-import logging
+import asyncio
+from collections import deque
 from datetime import datetime, timedelta
-from src.notification.pushover_integration import send_pushover_notification
-
-
-async def setup_notification_tracking():
-    async with aiosqlite.connect("cryptkeeper.db") as db:
-        await db.execute(
-            """
-        CREATE TABLE IF NOT EXISTS notification_tracking (
-            id INTEGER PRIMARY KEY,
-            timestamp TEXT NOT NULL
-        )
-        """
-        )
-        await db.commit()
-
-
-async def can_send_notification():
-    async with aiosqlite.connect("cryptkeeper.db") as db:
-        one_hour_ago = (datetime.now() - timedelta(hours=1)).isoformat()
-
+from typing import Deque, List, Optional
+from src.database import DatabaseHandler
+from src.metrics import METRICS
+
+
+class NotificationRateLimiter:
+    def __init__(
+        self,
+        db_handler: DatabaseHandler,
+        limit: int = 10,
+        window: timedelta = timedelta(hours=1),
+    ):
+        self.db_handler = db_handler
+        self.limit = limit
+        self.window = window
+        self.sent: Deque[datetime] = deque()
+        self.pending: List[datetime] = []
+        self.flush_task: Optional[asyncio.Task] = None
+
+    async def setup(self):
+        await self.clean_old_notifications()
+        window_start = (datetime.now() - self.window).isoformat()
+        db = await self.db_handler.connect()
         async with db.execute(
             """
-        SELECT COUNT(*) FROM notification_tracking
+        SELECT timestamp FROM notification_tracking
         WHERE timestamp > ?
+        ORDER BY timestamp
         """,
-            (one_hour_ago,),
+            (window_start,),
         ) as cursor:
-            count = await cursor.fetchone()
-
-        return count[0] < 10
-
-
-async def record_notification():
-    async with aiosqlite.connect("cryptkeeper.db") as db:
-        current_time = datetime.now().isoformat()
-
-        await db.execute(
-            """
-        INSERT INTO notification_tracking (timestamp)
-        VALUES (?)
-        """,
-            (current_time,),
-        )
-
-        await db.commit()
-
-
-async def clean_old_notifications():
-    async with aiosqlite.connect("cryptkeeper.db") as db:
-        one_hour_ago = (datetime.now() - timedelta(hours=1)).isoformat()
-
-        await db.execute(
+            self.sent = deque([datetime.fromisoformat(row[0]) async for row in cursor])
+
+    def prune(self, now: datetime):
+        window_start = now - self.window
+        while self.sent and self.sent[0] <= window_start:
+            self.sent.popleft()
+
+    def can_send_notification(self) -> bool:
+        self.prune(datetime.now())
+        return len(self.sent) < self.limit
+
+    def seconds_until_available(self) -> float:
+        now = datetime.now()
+        self.prune(now)
+        if len(self.sent) < self.limit:
+            return 0.0
+        METRICS.inc("cryptkeeper_notification_rate_limited_total")
+        return (self.sent[-self.limit] + self.window - now).total_seconds()
+
+    def record_notification(self):
+        current_time = datetime.now()
+        self.sent.append(current_time)
+        self.pending.append(current_time)
+        # Write-behind: persisting the send must not hold up the caller.
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        with METRICS.timer("cryptkeeper_notification_tracking_flush_seconds"):
+            await self.write_pending()
+        await self.clean_old_notifications()
+
+    async def write_pending(self):
+        while self.pending:
+            pending, self.pending = self.pending, []
+            async with self.db_handler.transaction() as db:
+                await db.executemany(
+                    """
+                INSERT INTO notification_tracking (timestamp)
+                VALUES (?)
+                """,
+                    [(timestamp.isoformat(),) for timestamp in pending],
+                )
+
+    async def clean_old_notifications(self):
+        window_start = (datetime.now() - self.window).isoformat()
+
+        await self.db_handler.execute(
             """
         DELETE FROM notification_tracking
         WHERE timestamp <= ?
         """,
-            (one_hour_ago,),
-        )
-
-        await db.commit()
-
-
-async def send_rate_limited_notification(
-    title, message, pushover_config, html: int = 0
-):
-    if await can_send_notification():
-        success = await send_pushover_notification(
-            title, message, pushover_config, html
+            (window_start,),
         )
-        if success:
-            await record_notification()
-            logging.info(f"Notification sent: {title}")
 
-        else:
-            logging.error(f"Failed to send notification: {title}")
-    else:
-        logging.warning("Notification rate limit reached. Skipping notification.")
+    async def close(self):
+        if self.flush_task is not None:
+            await self.flush_task
+        await self.flush()
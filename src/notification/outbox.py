@@ -0,0 +1,218 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from src.database import DatabaseHandler
+from src.metrics import METRICS
+from src.notification.notification_tracking import NotificationRateLimiter
+from src.notification.pushover_integration import (
+    MAX_MESSAGE_LENGTH,
+    MAX_TITLE_LENGTH,
+    PermanentNotificationError,
+    PushoverClient,
+)
+
+
+@dataclass
+class OutboxMessage:
+    title: str
+    message: str
+    html: int
+    attempts: int
+    ids: List[int] = field(default_factory=list)
+
+
+class NotificationOutbox:
+    def __init__(
+        self,
+        db_handler: DatabaseHandler,
+        rate_limiter: NotificationRateLimiter,
+        client: PushoverClient,
+        poll_interval: float = 60.0,
+        max_backoff: float = 3600.0,
+        max_digest_entries: int = 20,
+    ):
+        self.db_handler = db_handler
+        self.rate_limiter = rate_limiter
+        self.client = client
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff
+        self.max_digest_entries = max_digest_entries
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    async def enqueue(
+        self,
+        title: str,
+        entries: List[str],
+        html: int = 0,
+        kind: Optional[str] = None,
+        header: Optional[str] = None,
+    ):
+        # Rows sharing a kind are coalesced into one digest when sent; the
+        # title is a template receiving the digest's entry count.
+        now = datetime.now().isoformat()
+        async with self.db_handler.transaction() as db:
+            await db.executemany(
+                """
+            INSERT INTO notification_outbox
+                (kind, title, header, body, html, next_attempt_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+                [(kind, title, header, entry, html, now) for entry in entries],
+            )
+        self.wakeup.set()
+
+    async def due_messages(self) -> List[OutboxMessage]:
+        now = datetime.now().isoformat()
+        groups: List[List[tuple]] = []
+        open_digests: Dict[str, List[tuple]] = {}
+        db = await self.db_handler.connect()
+        async with db.execute(
+            """
+        SELECT id, kind, title, header, body, html, attempts
+        FROM notification_outbox
+        WHERE next_attempt_at <= ?
+        ORDER BY id
+        """,
+            (now,),
+        ) as cursor:
+            async for row in cursor:
+                kind = row[1]
+                if kind is None:
+                    groups.append([row])
+                    continue
+                group = open_digests.get(kind)
+                if group is None or not self.fits(group + [row]):
+                    group = open_digests[kind] = []
+                    groups.append(group)
+                group.append(row)
+        return [self.build_message(group) for group in groups]
+
+    def fits(self, rows: List[tuple]) -> bool:
+        # Digests are split before they outgrow Pushover's limits, since an
+        # oversized message is rejected outright and would be dead-lettered.
+        if len(rows) > self.max_digest_entries:
+            return False
+        message = self.build_message(rows)
+        return (
+            len(message.message) <= MAX_MESSAGE_LENGTH
+            and len(message.title) <= MAX_TITLE_LENGTH
+        )
+
+    @staticmethod
+    def build_message(rows: List[tuple]) -> OutboxMessage:
+        _, kind, title, header, body, html, _ = rows[-1]
+        ids = [row[0] for row in rows]
+        attempts = max(row[6] for row in rows)
+        if kind is None:
+            return OutboxMessage(title, body, html, attempts, ids)
+        body = "".join(row[4] for row in rows)
+        if html:
+            body = f"<ul>{body}</ul>"
+        message = f"{header}\n\n{body}" if header else body
+        return OutboxMessage(
+            title.format(count=len(rows)), message, html, attempts, ids
+        )
+
+    async def mark_sent(self, message: OutboxMessage):
+        async with self.db_handler.transaction() as db:
+            await db.executemany(
+                "DELETE FROM notification_outbox WHERE id = ?",
+                [(row_id,) for row_id in message.ids],
+            )
+
+    async def mark_failed(self, message: OutboxMessage):
+        delay = min(self.max_backoff, 30 * 2**message.attempts)
+        retry_at = (datetime.now() + timedelta(seconds=delay)).isoformat()
+        async with self.db_handler.transaction() as db:
+            await db.executemany(
+                """
+            UPDATE notification_outbox
+            SET attempts = attempts + 1, next_attempt_at = ?
+            WHERE id = ?
+            """,
+                [(retry_at, row_id) for row_id in message.ids],
+            )
+        logging.error(
+            f"Failed to send notification: {message.title}. Retrying in {delay}s"
+        )
+
+    async def dead_letter(self, message: OutboxMessage, error: str):
+        # Rejected rows leave the outbox so they stop being retried, but are
+        # kept for inspection.
+        now = datetime.now().isoformat()
+        async with self.db_handler.transaction() as db:
+            await db.executemany(
+                """
+            INSERT INTO notification_dead_letters
+                (kind, title, header, body, html, attempts, error, failed_at)
+            SELECT kind, title, header, body, html, attempts + 1, ?, ?
+            FROM notification_outbox WHERE id = ?
+            """,
+                [(error, now, row_id) for row_id in message.ids],
+            )
+            await db.executemany(
+                "DELETE FROM notification_outbox WHERE id = ?",
+                [(row_id,) for row_id in message.ids],
+            )
+        logging.error(
+            f"Pushover rejected notification {message.title} ({error}); "
+            f"moved to notification_dead_letters"
+        )
+
+    async def drain(self) -> float:
+        # Returns how long to wait before the next drain is worthwhile.
+        for message in await self.due_messages():
+            wait = self.rate_limiter.seconds_until_available()
+            if wait > 0:
+                logging.warning(
+                    f"Notification rate limit reached. Holding outbox for {wait:.0f}s."
+                )
+                return wait
+            try:
+                with METRICS.timer("cryptkeeper_notification_send_seconds"):
+                    success = await self.client.send(
+                        message.title, message.message, message.html
+                    )
+            except PermanentNotificationError as e:
+                await self.dead_letter(message, str(e))
+                METRICS.inc("cryptkeeper_notifications_total", result="rejected")
+                continue
+            if success:
+                self.rate_limiter.record_notification()
+                await self.mark_sent(message)
+                METRICS.inc("cryptkeeper_notifications_total", result="sent")
+                logging.info(f"Notification sent: {message.title}")
+            else:
+                await self.mark_failed(message)
+                METRICS.inc("cryptkeeper_notifications_total", result="failed")
+        return self.poll_interval
+
+    async def run(self):
+        while True:
+            self.wakeup.clear()
+            try:
+                delay = await self.drain()
+            except Exception:  # pylint: disable=broad-except
+                logging.exception("Notification outbox drain failed")
+                delay = self.poll_interval
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run(), name="notification-outbox")
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.client.close()
@@ -1,6 +1,20 @@
+import asyncio
 import configparser
 import logging
+from typing import Optional
 import aiohttp
+from src.http_client import HttpClient
+
+PUSHOVER_API_URL = "https://api.pushover.net/1/messages.json"
+# Pushover rejects longer titles and messages with a 400.
+MAX_TITLE_LENGTH = 250
+MAX_MESSAGE_LENGTH = 1024
+
+
+class PermanentNotificationError(Exception):
+    # Pushover answers 4xx (other than 429) for requests it will never
+    # accept, such as a bad token or user key; retrying cannot succeed.
+    pass
 
 
 def load_pushover_config():
@@ -12,8 +26,14 @@ def load_pushover_config():
     }
 
 
-async def send_pushover_notification(title, message, config, html: int = 0):
-    url = "https://api.pushover.net/1/messages.json"
+async def send_pushover_notification(
+    title,
+    message,
+    config,
+    html: int = 0,
+    session: Optional[aiohttp.ClientSession] = None,
+):
+    url = config.get("api_url", PUSHOVER_API_URL)
     data = {
         "token": config["api_token"],
         "user": config["user_key"],
@@ -22,11 +42,49 @@ async def send_pushover_notification(title, message, config, html: int = 0):
         "html": html,
     }
 
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.post(url, data=data) as response:
-                response.raise_for_status()
-                return await response.json()
-        except aiohttp.ClientError as e:
-            logging.error(f"Error sending Pushover notification: {str(e)}")
-            return False
+    if session is None:
+        async with aiohttp.ClientSession() as session:
+            return await post_notification(session, url, data)
+    return await post_notification(session, url, data)
+
+
+async def post_notification(session: aiohttp.ClientSession, url: str, data: dict):
+    try:
+        async with session.post(url, data=data) as response:
+            if 400 <= response.status < 500 and response.status != 429:
+                body = await response.text()
+                raise PermanentNotificationError(
+                    f"status {response.status}: {body[:200]}"
+                )
+            response.raise_for_status()
+            return await response.json()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logging.error(f"Error sending Pushover notification: {str(e)}")
+        return False
+
+
+def clip(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[: limit - 1] + "…"
+
+
+class PushoverClient:
+    def __init__(self, config, http_client: Optional[HttpClient] = None):
+        self.config = config
+        self.owns_http_client = http_client is None
+        self.http_client = http_client or HttpClient()
+
+    async def send(self, title, message, html: int = 0):
+        # The pooled session keeps the TCP/TLS connection to Pushover alive
+        # between messages instead of handshaking for every send. Anything
+        # over Pushover's limits is cut short rather than rejected.
+        return await send_pushover_notification(
+            clip(title, MAX_TITLE_LENGTH),
+            clip(message, MAX_MESSAGE_LENGTH),
+            self.config,
+            html,
+            session=self.http_client.session,
+        )
+
+    async def close(self):
+        if self.owns_http_client:
+            await self.http_client.close()
@@ -0,0 +1,140 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+import importlib.util
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+# Only the blocks each extractor reads are built into a tree; everything
+# else on the page is tokenized and thrown away by the parser.
+STRAINERS: Dict[str, Tuple[str, Dict[str, Any]]] = {
+    "homepage": ("div", {"class_": ["heading", "cell"]}),
+    "news_content": ("div", {"class_": "mw-parser-output"}),
+    "release_system": ("tr", {}),
+}
+
+PARSERS = ("lxml", "html.parser")
+
+
+@lru_cache(maxsize=None)
+def strainer(name: str):
+    # bs4 is imported on the first parse, so a cycle that finds every page
+    # unchanged never loads it.
+    from bs4 import SoupStrainer
+
+    tag, attrs = STRAINERS[name]
+    return SoupStrainer(tag, **attrs)
+
+
+def choose_parser(preferred: str = "auto") -> str:
+    lxml_available = importlib.util.find_spec("lxml") is not None
+    if preferred == "auto":
+        return "lxml" if lxml_available else "html.parser"
+    if preferred not in PARSERS:
+        raise ValueError(
+            f"Unknown HTML parser {preferred!r}, expected one of {PARSERS}"
+        )
+    if preferred == "lxml" and not lxml_available:
+        logging.warning("lxml is not installed, falling back to html.parser")
+        return "html.parser"
+    return preferred
+
+
+def make_soup(content: str, parser: str = "html.parser", parse_only=None):
+    from bs4 import BeautifulSoup
+
+    return BeautifulSoup(content, parser, parse_only=parse_only)
+
+
+# The functions below run inside the scrapers' parse executor, which may be a
+# process pool, so they take and return plain picklable data only.
+
+
+def parse_homepage(
+    content: str, parser: str = "html.parser"
+) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+    soup = make_soup(content, parser, strainer("homepage"))
+    news_entries: List[Dict[str, str]] = []
+    release_entries: List[Dict[str, str]] = []
+
+    news_section = soup.find("div", class_="heading", string="Hidden Palace news")
+    if news_section:
+        for item in news_section.find_next("div", class_="cell").find_all("dd"):
+            entry = parse_news_entry(item)
+            if entry is not None:
+                news_entries.append(entry)
+
+    releases_section = soup.find("div", class_="heading", string="Community releases")
+    if releases_section:
+        for item in releases_section.find_next("div", class_="cell").find_all("li"):
+            release_entries.append(parse_release_entry(item))
+
+    return news_entries, release_entries
+
+
+def parse_news_entry(item) -> Optional[Dict[str, str]]:
+    if item.find("b") is None:
+        return None
+    return {
+        "date": item.find("b").text.strip().rstrip(":"),
+        "title": item.find("a").text.strip(),
+        "href": item.find("a")["href"],
+    }
+
+
+def parse_release_entry(item) -> Dict[str, str]:
+    return {
+        "date": item.contents[0].strip().rstrip(":"),
+        "title": item.find("a").text.strip(),
+        "href": item.find("a")["href"],
+        "author": (
+            item.contents[-1].text.strip() if len(item.contents) > 2 else "Unknown"
+        ),
+    }
+
+
+def parse_archive_page(
+    content: str, kind: str, parser: str = "html.parser"
+) -> List[Dict[str, str]]:
+    # Archive pages list older entries in the same markup as the homepage
+    # blocks (dl/dd for news, ul/li for releases) inside the wiki content.
+    soup = make_soup(content, parser, strainer("news_content"))
+    entries: List[Dict[str, str]] = []
+    if kind == "news":
+        for item in soup.find_all("dd"):
+            entry = parse_news_entry(item) if item.find("a") else None
+            if entry is not None:
+                entries.append(entry)
+    else:
+        for item in soup.find_all("li"):
+            if item.find("a") is not None and isinstance(item.contents[0], str):
+                entries.append(parse_release_entry(item))
+    return entries
+
+
+def parse_news_content(content: str, parser: str = "html.parser") -> Optional[str]:
+    soup = make_soup(content, parser, strainer("news_content"))
+    content_div = soup.find("div", class_="mw-parser-output")
+    if content_div:
+        paragraphs = content_div.find_all("p")
+        return "\n".join([p.text for p in paragraphs])
+    return None
+
+
+def parse_release_system(content: str, parser: str = "html.parser") -> Optional[str]:
+    soup = make_soup(content, parser, strainer("release_system"))
+    system_col = soup.find("td", string="System")
+    value = system_col.find_next_sibling("td") if system_col else None
+    if value is None:
+        return None
+    system = value.text.strip()
+    return system if system else None
+
+
+def make_executor(kind: str = "thread", workers: Optional[int] = None):
+    if kind == "thread":
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="parser")
+    if kind == "process":
+        return ProcessPoolExecutor(max_workers=workers)
+    if kind == "inline":
+        return None
+    raise ValueError(f"Unknown parse executor {kind!r}")
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+from src.config import Config, ConfigError
+
+THROTTLE_STATUSES = {429, 503}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        min_rate: float = 0.05,
+        base_backoff: float = 1.0,
+        max_backoff: float = 300.0,
+    ):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.backoff = base_backoff
+        self.lock = asyncio.Lock()
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        # Waiters queue on the lock so tokens are handed out in arrival order.
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def on_success(self):
+        # Additive increase back towards the configured rate.
+        self.backoff = self.base_backoff
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> float:
+        # Multiplicative decrease, and pause the host for Retry-After or the
+        # current exponential backoff, whichever the server asked for.
+        self.rate = max(self.min_rate, self.rate / 2)
+        delay = retry_after if retry_after is not None else self.backoff
+        self.backoff = min(self.max_backoff, self.backoff * 2)
+        self.tokens = 0.0
+        self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+        return delay
+
+    def retune(self, rate: float, burst: int, max_backoff: float):
+        # A host already slowed down by throttling stays slowed down and
+        # climbs back towards the new ceiling as requests succeed.
+        self.max_rate = rate
+        self.rate = min(self.rate, rate)
+        self.min_rate = min(self.min_rate, rate)
+        self.burst = burst
+        self.tokens = min(self.tokens, float(burst))
+        self.max_backoff = max_backoff
+        self.backoff = min(self.backoff, max_backoff)
+
+
+class HostRateLimiter:
+    def __init__(
+        self,
+        rate: float = 1.0,
+        burst: int = 5,
+        max_backoff: float = 300.0,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_backoff = max_backoff
+        self.buckets: Dict[str, TokenBucket] = {}
+
+    @staticmethod
+    def settings(config: Config, section: str = "Scraper") -> Dict[str, Any]:
+        settings = {
+            "rate": config.setting(section, "requests_per_second", 1.0, "float"),
+            "burst": config.setting(section, "burst", 5, "int"),
+            "max_backoff": config.setting(
+                section, "max_backoff_seconds", 300.0, "float"
+            ),
+        }
+        if settings["rate"] <= 0 or settings["burst"] < 1:
+            raise ConfigError(
+                f"[{section}] requests_per_second and burst must be positive"
+            )
+        return settings
+
+    @classmethod
+    def from_config(cls, config: Config, section: str = "Scraper") -> "HostRateLimiter":
+        return cls(**cls.settings(config, section))
+
+    def retune(self, rate: float, burst: int, max_backoff: float):
+        # Applied on reload; buckets for hosts already seen keep their
+        # tokens and any backoff in progress.
+        self.rate = rate
+        self.burst = burst
+        self.max_backoff = max_backoff
+        for bucket in self.buckets.values():
+            bucket.retune(rate, burst, max_backoff)
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = urlsplit(url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(
+                self.rate, self.burst, max_backoff=self.max_backoff
+            )
+        return self.buckets[host]
+
+    async def acquire(self, url: str):
+        await self.bucket(url).acquire()
+
+    def record(self, url: str, status: Optional[int], retry_after: Optional[str]):
+        bucket = self.bucket(url)
+        if status is None or status in THROTTLE_STATUSES or status >= 500:
+            delay = bucket.on_throttle(parse_retry_after(retry_after))
+            logging.warning(
+                f"Backing off {urlsplit(url).netloc} for {delay:.1f}s "
+                f"(status {status}, rate now {bucket.rate:.2f} req/s)"
+            )
+        else:
+            bucket.on_success()
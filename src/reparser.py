@@ -0,0 +1,131 @@
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from src.config import Config
+from src.database import DatabaseHandler, unpack_content
+from src.metrics import METRICS
+from src.models import WriteBatch
+from src.parsing import (
+    choose_parser,
+    make_executor,
+    parse_archive_page,
+    parse_homepage,
+    parse_news_content,
+    parse_release_system,
+)
+from src.scrapers.homepage_scraper import HomepageScraper
+
+# Listings run before detail pages so items they add can pick up their
+# content from stored detail snapshots in the same pass.
+LISTING_KINDS = ("homepage", "news_archive", "releases_archive")
+DETAIL_KINDS = ("news", "release")
+SNAPSHOT_KINDS = LISTING_KINDS + DETAIL_KINDS
+
+
+def reparse_snapshot(kind: str, data: bytes, parser: str) -> Any:
+    # Runs in the parse executor, so decompression is spread across workers
+    # together with the parsing.
+    content = unpack_content(data)
+    if kind == "homepage":
+        return parse_homepage(content, parser)
+    if kind.endswith("_archive"):
+        return parse_archive_page(content, kind[: -len("_archive")], parser)
+    if kind == "news":
+        return parse_news_content(content, parser)
+    return parse_release_system(content, parser)
+
+
+class Reparser:
+    def __init__(
+        self,
+        db_handler: DatabaseHandler,
+        config: Config,
+        executor_kind: str = "process",
+        workers: Optional[int] = None,
+        batch_size: int = 200,
+    ):
+        self.db_handler = db_handler
+        settings = config.scraper_settings()
+        self.base_url = settings.base_url
+        self.parser = choose_parser(settings.parser)
+        self.executor_kind = executor_kind
+        self.executor = make_executor(executor_kind, workers)
+        self.batch_size = batch_size
+
+    async def run(self, kinds: Iterable[str] = SNAPSHOT_KINDS) -> Dict[str, int]:
+        kinds = set(kinds)
+        counts = {kind: 0 for kind in SNAPSHOT_KINDS if kind in kinds}
+        try:
+            for group in (LISTING_KINDS, DETAIL_KINDS):
+                selected = [kind for kind in group if kind in kinds]
+                if not selected:
+                    continue
+                async for snapshots in self.db_handler.iter_latest_snapshots(
+                    selected, self.batch_size
+                ):
+                    await self.reparse_batch(snapshots, counts)
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+        return counts
+
+    async def reparse_batch(
+        self, snapshots: List[Tuple[str, str, bytes]], counts: Dict[str, int]
+    ):
+        with METRICS.timer("cryptkeeper_reparse_batch_seconds"):
+            results = await asyncio.gather(
+                *[self.parse(kind, data) for _, kind, data in snapshots]
+            )
+        batch = WriteBatch()
+        detail_urls = {
+            "news": [url for url, kind, _ in snapshots if kind == "news"],
+            "release": [url for url, kind, _ in snapshots if kind == "release"],
+        }
+        news_hashes = await self.db_handler.hashes_for_urls("news", detail_urls["news"])
+        release_hashes = await self.db_handler.hashes_for_urls(
+            "new_releases", detail_urls["release"]
+        )
+        for (url, kind, _), result in zip(snapshots, results):
+            counts[kind] += 1
+            if kind == "homepage":
+                news_entries, release_entries = result
+                self.add_entries(batch, news_entries, release_entries)
+            elif kind == "news_archive":
+                self.add_entries(batch, result, [])
+            elif kind == "releases_archive":
+                self.add_entries(batch, [], result)
+            elif kind == "news":
+                content = (
+                    result if result is not None else HomepageScraper.NEWS_PLACEHOLDER
+                )
+                for item_hash in news_hashes.get(url, []):
+                    batch.news_content[item_hash] = content
+            else:
+                system = result or HomepageScraper.SYSTEM_PLACEHOLDER
+                for item_hash in release_hashes.get(url, []):
+                    batch.release_systems[item_hash] = system
+        await self.db_handler.write_batch(batch)
+        logging.info(f"Reparsed {len(snapshots)} snapshots")
+
+    def add_entries(
+        self,
+        batch: WriteBatch,
+        news_entries: List[Dict[str, str]],
+        release_entries: List[Dict[str, str]],
+    ):
+        # Items already stored are left alone by the INSERT OR IGNORE.
+        batch.news += [
+            HomepageScraper.news_item(entry, self.base_url) for entry in news_entries
+        ]
+        batch.releases += [
+            HomepageScraper.release_item(entry, self.base_url)
+            for entry in release_entries
+        ]
+
+    async def parse(self, kind: str, data: bytes) -> Any:
+        if self.executor is None:
+            return reparse_snapshot(kind, data, self.parser)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, reparse_snapshot, kind, data, self.parser
+        )
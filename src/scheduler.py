@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, List, Optional
+from src.database import DatabaseHandler
+from src.metrics import METRICS
+from src.models import SourceState
+from src.scrapers.base_scraper import BaseScraper
+
+
+@dataclass
+class Source:
+    name: str
+    scraper: BaseScraper
+    interval: float
+    jitter: float = 0.0
+    min_interval: Optional[float] = None
+    max_interval: Optional[float] = None
+    ewma_alpha: float = 0.3
+    polls_per_change: float = 2.0
+    state: Optional[SourceState] = None
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    @property
+    def adaptive(self) -> bool:
+        return self.min_interval is not None and self.max_interval is not None
+
+
+class Scheduler:
+    def __init__(
+        self,
+        sources: List[Source],
+        db_handler: Optional[DatabaseHandler] = None,
+        before_run: Optional[Callable[[], Awaitable[None]]] = None,
+        after_run: Optional[Callable[[], Awaitable[None]]] = None,
+    ):
+        self.sources = sources
+        self.db_handler = db_handler
+        self.before_run = before_run
+        self.after_run = after_run
+
+    def adaptive_interval(self, source: Source, now: float) -> float:
+        state = source.state
+        if state.mean_gap is None:
+            estimate = source.interval
+        else:
+            # A quiet spell longer than the usual gap means the site slowed
+            # down, so stretch the estimate instead of polling at the old pace.
+            estimate = max(state.mean_gap, now - state.last_change)
+            estimate /= source.polls_per_change
+        return min(source.max_interval, max(source.min_interval, estimate))
+
+    async def record_run(self, source: Source, new_items: int):
+        state = source.state
+        now = time.time()
+        if new_items:
+            if state.last_change is not None:
+                gap = now - state.last_change
+                if state.mean_gap is None:
+                    state.mean_gap = gap
+                else:
+                    state.mean_gap = (
+                        source.ewma_alpha * gap
+                        + (1 - source.ewma_alpha) * state.mean_gap
+                    )
+            state.last_change = now
+        if source.adaptive:
+            state.interval = self.adaptive_interval(source, now)
+        if self.db_handler is not None:
+            await self.db_handler.save_source_state(state)
+
+    def next_delay(self, source: Source) -> float:
+        interval = source.interval
+        if source.adaptive and source.state.interval is not None:
+            interval = source.state.interval
+        return max(0.0, interval + random.uniform(-source.jitter, source.jitter))
+
+    async def run_once(self, source: Source) -> bool:
+        if source.lock.locked():
+            logging.warning(
+                f"Previous run of {source.name} still in progress, skipping"
+            )
+            return False
+        async with source.lock:
+            logging.info(f"Starting scrape cycle for {source.name}")
+            try:
+                if self.before_run is not None:
+                    await self.before_run()
+                with METRICS.timer("cryptkeeper_cycle_seconds", source=source.name):
+                    new_items = await source.scraper.scrape()
+                METRICS.inc(
+                    "cryptkeeper_new_items_total", new_items or 0, source=source.name
+                )
+                await self.record_run(source, new_items or 0)
+                if self.after_run is not None:
+                    await self.after_run()
+            except Exception:  # pylint: disable=broad-except
+                # One broken source must not take the other schedules down.
+                logging.exception(f"Scrape cycle for {source.name} failed")
+                return False
+        return True
+
+    async def run_source(self, source: Source):
+        while True:
+            await self.run_once(source)
+            delay = self.next_delay(source)
+            logging.info(
+                f"Scrape cycle for {source.name} completed. "
+                f"Sleeping for {delay / 3600:.2f} hours"
+            )
+            await asyncio.sleep(delay)
+
+    async def load_state(self):
+        for source in self.sources:
+            if self.db_handler is not None:
+                source.state = await self.db_handler.get_source_state(source.name)
+            elif source.state is None:
+                source.state = SourceState(source.name)
+
+    async def run(self):
+        await self.load_state()
+        tasks = [
+            asyncio.create_task(self.run_source(source), name=f"source-{source.name}")
+            for source in self.sources
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # Let in-flight cycles unwind (and flush their buffers) before
+            # the caller tears down the shared database connection.
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def close(self):
+        for source in self.sources:
+            await source.scraper.close()
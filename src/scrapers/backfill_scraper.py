@@ -0,0 +1,106 @@
+import asyncio
+import logging
+from typing import Optional, Set
+from src.metrics import METRICS
+from src.models import BackfillState, WriteBatch
+from src.parsing import parse_archive_page
+from .homepage_scraper import HomepageScraper
+
+
+class BackfillScraper(HomepageScraper):
+    KINDS = ("news", "releases")
+
+    def __init__(self, *args, section: str = "Backfill", **kwargs):
+        super().__init__(*args, section=section, **kwargs)
+        self.page_concurrency = self.setting("page_concurrency", 4, "int")
+        self.max_pages = self.setting("max_pages_per_run", 10000, "int")
+        self.restart = False
+
+    async def scrape(self) -> int:
+        # Archive listings for every configured kind are walked side by side;
+        # the shared rate limiter keeps the combined request rate in bounds.
+        counts = await asyncio.gather(
+            *[
+                self.backfill(kind, url)
+                for kind in self.KINDS
+                if (url := self.setting(f"{kind}_archive_url"))
+            ]
+        )
+        return sum(counts)
+
+    async def backfill(self, kind: str, url_template: str) -> int:
+        name = f"{self.section}:{kind}"
+        state = await self.db_handler.get_backfill_state(name)
+        if self.restart:
+            state = BackfillState(name)
+        if state.completed:
+            logging.info(f"Backfill of {kind} already completed")
+            return 0
+
+        logging.info(f"Backfilling {kind} from page {state.next_page}")
+        pending = iter(range(state.next_page, state.next_page + self.max_pages))
+        finished: Set[int] = set()
+        inserted = 0
+
+        async def worker():
+            nonlocal inserted
+            for page in pending:
+                if state.last_page is not None and page > state.last_page:
+                    return
+                result = await self.fetch_page(
+                    url_template.format(page=page), snapshot_kind=f"{kind}_archive"
+                )
+                if result.content is None and result.status != 404:
+                    # Leave the checkpoint before this page and let the next
+                    # run retry it.
+                    logging.warning(f"Backfill of {kind} stalled at page {page}")
+                    return
+                count = await self.store_page(kind, result.content)
+                if count is None:
+                    # The first missing or empty page marks the end.
+                    if state.last_page is None or page - 1 < state.last_page:
+                        state.last_page = page - 1
+                    return
+                inserted += count
+                if result.snapshot is not None:
+                    await self.db_handler.write_batch(
+                        WriteBatch(snapshots=[result.snapshot])
+                    )
+                finished.add(page)
+                await self.checkpoint(state, finished)
+
+        await asyncio.gather(*[worker() for _ in range(self.page_concurrency)])
+        state.completed = (
+            state.last_page is not None and state.next_page > state.last_page
+        )
+        await self.db_handler.save_backfill_state(state)
+        logging.info(
+            f"Backfill of {kind} stopped before page {state.next_page}: "
+            f"{inserted} items added"
+        )
+        return inserted
+
+    async def checkpoint(self, state: BackfillState, finished: Set[int]):
+        # Pages complete out of order; the checkpoint only advances past pages
+        # whose items are all stored, so a resumed run redoes at most the
+        # pages that were in flight.
+        while state.next_page in finished:
+            finished.discard(state.next_page)
+            state.next_page += 1
+        await self.db_handler.save_backfill_state(state)
+
+    async def store_page(self, kind: str, content: Optional[str]) -> Optional[int]:
+        entries = []
+        if content:
+            entries = await self.run_parser(
+                parse_archive_page, content, kind, self.parser
+            )
+        if not entries:
+            return None
+        METRICS.inc("cryptkeeper_backfill_pages_total", kind=kind)
+        if kind == "news":
+            news, releases = await self.extract_news(entries), []
+        else:
+            news, releases = [], await self.extract_new_releases(entries)
+        # History is stored silently; only the live homepage notifies.
+        return await self.update_news_and_releases(news, releases, notify=False)
@@ -1,9 +1,19 @@
 from abc import ABC, abstractmethod
+import asyncio
+import codecs
+import hashlib
 import aiohttp
-from bs4 import BeautifulSoup
 import logging
-from src.config import Config
+from typing import Any, Callable, List, Optional, Tuple, Type
+from urllib.parse import urlsplit
+from src.config import Config, ScraperSettings
 from src.database import DatabaseHandler
+from src.http_client import HttpClient
+from src.metrics import METRICS
+from src.models import FetchResult, HttpValidators, PageSnapshot
+from src.parsing import choose_parser, make_executor
+from src.rate_limiter import THROTTLE_STATUSES, HostRateLimiter
+from src.stream_parsing import StreamExtractor
 from src.notification.notification_manager import NotificationManager
 
 
@@ -13,40 +23,215 @@ class BaseScraper(ABC):
         db_handler: DatabaseHandler,
         notification_manager: NotificationManager,
         config: Config,
+        section: str = "Scraper",
+        rate_limiter: Optional[HostRateLimiter] = None,
+        http_client: Optional[HttpClient] = None,
     ):
         self.db_handler = db_handler
         self.notification_manager = notification_manager
         self.config = config
-        self.session = None
+        self.section = section
+        # Scrapers normally share the process-wide client; one created here
+        # is owned, and closed, by this scraper.
+        self.owns_http_client = http_client is None
+        self.http_client = http_client or HttpClient.from_config(config)
+        self.parse_executor = None
+        self.rate_limiter = rate_limiter or HostRateLimiter.from_config(config, section)
+        self.settings: Optional[ScraperSettings] = None
+        self.apply_settings(config.scraper_settings(section))
+
+    def apply_settings(self, settings: ScraperSettings):
+        # The snapshot is swapped whole on reload: a fetch or parse already
+        # running finishes with the values it started with.
+        previous = self.settings
+        self.settings = settings
+        self.parser = choose_parser(settings.parser)
+        if previous is not None and (
+            previous.parse_executor != settings.parse_executor
+            or previous.parse_workers != settings.parse_workers
+        ):
+            # Parses already submitted still complete; the next one starts
+            # a pool with the new shape.
+            if self.parse_executor is not None:
+                self.parse_executor.shutdown(wait=False)
+                self.parse_executor = None
+
+    def setting(self, key: str, fallback: Any = None, kind: str = "") -> Any:
+        return self.config.setting(self.section, key, fallback, kind)
 
     async def get_session(self):
-        if self.session is None:
-            self.session = aiohttp.ClientSession()
-        return self.session
+        return self.http_client.session
 
     async def close_session(self):
-        if self.session is not None:
-            await self.session.close()
-            self.session = None
+        if self.owns_http_client:
+            await self.http_client.close()
 
-    async def fetch_page_content(self, url: str) -> BeautifulSoup:
+    async def fetch_page(
+        self,
+        url: str,
+        conditional: bool = False,
+        extractor: Optional[Type[StreamExtractor]] = None,
+        snapshot_kind: Optional[str] = None,
+    ) -> FetchResult:
         session = await self.get_session()
-        try:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    return await response.text()
-                else:
-                    logging.error(
-                        f"Failed to fetch page content from {url}. Status code: {response.status}"
+        host = urlsplit(url).netloc
+        cached = None
+        if conditional:
+            cached = await self.db_handler.get_http_validators(url)
+        headers = cached.request_headers() if cached else {}
+        settings = self.settings
+        for attempt in range(settings.max_retries + 1):
+            with METRICS.timer("cryptkeeper_rate_limit_wait_seconds", host=host):
+                await self.rate_limiter.acquire(url)
+            try:
+                with METRICS.timer("cryptkeeper_fetch_seconds", host=host):
+                    result = await self.request_page(
+                        session, url, headers, cached, extractor
                     )
-                    return None
-        except aiohttp.ClientError as e:
-            logging.error(f"Error fetching page content from {url}: {e}")
-            return None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.rate_limiter.record(url, None, None)
+                METRICS.inc(
+                    "cryptkeeper_http_errors_total", host=host, error=type(e).__name__
+                )
+                if attempt < settings.max_retries:
+                    continue
+                logging.error(f"Error fetching page content from {url}: {e}")
+                return FetchResult(url)
+            if result.status == 200 or result.unchanged:
+                if settings.snapshots and snapshot_kind and not result.unchanged:
+                    result.snapshot = PageSnapshot(url, snapshot_kind, result.content)
+                return result
+            if (
+                result.status in THROTTLE_STATUSES or result.status >= 500
+            ) and attempt < settings.max_retries:
+                continue
+            logging.error(
+                f"Failed to fetch page content from {url}. Status code: {result.status}"
+            )
+            return result
+        return FetchResult(url)
+
+    async def request_page(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        headers: dict,
+        cached: Optional[HttpValidators],
+        extractor: Optional[Type[StreamExtractor]] = None,
+    ) -> FetchResult:
+        host = urlsplit(url).netloc
+        async with session.get(url, headers=headers) as response:
+            self.rate_limiter.record(
+                url, response.status, response.headers.get("Retry-After")
+            )
+            METRICS.inc(
+                "cryptkeeper_http_responses_total", host=host, status=response.status
+            )
+            if response.status == 304 and cached is not None:
+                logging.info(f"{url} not modified since last fetch")
+                METRICS.inc("cryptkeeper_http_cache_hits_total", kind="not_modified")
+                return FetchResult(url, status=304, unchanged=True, validators=cached)
+            if response.status != 200:
+                return FetchResult(url, status=response.status)
+
+            extracted = None
+            if extractor is None:
+                content = await response.text()
+                body = content.encode()
+            else:
+                # A fresh extractor per attempt so a retry never sees state
+                # left over from a half-read body.
+                stream = extractor()
+                body, content = await self.stream_body(url, response, stream)
+                extracted = stream.result()
+            METRICS.inc("cryptkeeper_http_bytes_total", len(body), host=host)
+            validators = HttpValidators(
+                url,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+                digest=hashlib.sha256(body).hexdigest(),
+            )
+            # Servers without validators still let us skip parsing when the
+            # body is byte-for-byte what we saw last time.
+            unchanged = cached is not None and cached.digest == validators.digest
+            if unchanged:
+                logging.info(f"{url} content digest unchanged")
+                METRICS.inc("cryptkeeper_http_cache_hits_total", kind="digest")
+            elif cached is not None:
+                METRICS.inc("cryptkeeper_http_cache_misses_total")
+            return FetchResult(
+                url,
+                content=content,
+                status=200,
+                unchanged=unchanged,
+                validators=validators,
+                extracted=extracted,
+            )
+
+    async def stream_body(
+        self,
+        url: str,
+        response: aiohttp.ClientResponse,
+        extractor: StreamExtractor,
+    ) -> Tuple[bytes, str]:
+        # Feed the extractor as chunks arrive and stop reading once it has
+        # what it needs or the byte cap is hit. Leaving the body unread makes
+        # aiohttp drop the connection instead of reusing it, which is still
+        # cheaper than downloading the rest of a large page.
+        decoder = codecs.getincrementaldecoder(response.charset or "utf-8")(
+            errors="replace"
+        )
+        chunks: List[bytes] = []
+        text: List[str] = []
+        size = 0
+        max_bytes = self.settings.max_stream_bytes
+        async for chunk in response.content.iter_chunked(
+            self.settings.stream_chunk_size
+        ):
+            capped = max_bytes and size + len(chunk) > max_bytes
+            if capped:
+                chunk = chunk[: max_bytes - size]
+                logging.warning(f"Stopped reading {url} at the {max_bytes} byte cap")
+            size += len(chunk)
+            chunks.append(chunk)
+            decoded = decoder.decode(chunk)
+            text.append(decoded)
+            extractor.feed(decoded)
+            if extractor.done or capped:
+                reason = "extracted" if extractor.done else "byte_cap"
+                METRICS.inc("cryptkeeper_http_stream_early_stops_total", reason=reason)
+                break
+        else:
+            decoded = decoder.decode(b"", final=True)
+            text.append(decoded)
+            extractor.feed(decoded)
+        extractor.close()
+        return b"".join(chunks), "".join(text)
+
+    async def fetch_page_content(self, url: str) -> Optional[str]:
+        result = await self.fetch_page(url)
+        return result.content
+
+    async def run_parser(self, func: Callable[..., Any], *args) -> Any:
+        if self.settings.parse_executor == "inline":
+            with METRICS.timer("cryptkeeper_parse_seconds", parser=func.__name__):
+                return func(*args)
+        if self.parse_executor is None:
+            self.parse_executor = make_executor(
+                self.settings.parse_executor, self.settings.parse_workers
+            )
+        loop = asyncio.get_running_loop()
+        with METRICS.timer("cryptkeeper_parse_seconds", parser=func.__name__):
+            return await loop.run_in_executor(self.parse_executor, func, *args)
 
     @abstractmethod
-    async def scrape(self):
+    async def scrape(self) -> int:
+        # Returns the number of new items found, which drives the adaptive
+        # polling interval in the scheduler.
         pass
 
     async def close(self):
         await self.close_session()
+        if self.parse_executor is not None:
+            self.parse_executor.shutdown(wait=False, cancel_futures=True)
+            self.parse_executor = None
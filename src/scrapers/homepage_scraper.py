@@ -1,181 +1,247 @@
 import asyncio
-import hashlib
-from bs4 import BeautifulSoup
 import logging
 from typing import List, Dict
-from src.models import NewsItem, ReleaseItem
+from src.config import ScraperSettings
+from src.metrics import METRICS
+from src.models import FetchResult, HashStatus, NewsItem, ReleaseItem, WriteBatch
+from src.parsing import parse_homepage, parse_news_content, parse_release_system
+from src.stream_parsing import NewsContentExtractor, ReleaseSystemExtractor
+from src.write_buffer import WriteBuffer
 from .base_scraper import BaseScraper
 
 
 class HomepageScraper(BaseScraper):
+    NEWS_PLACEHOLDER = "Error fetching news content"
+    SYSTEM_PLACEHOLDER = "Unknown"
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.semaphore = asyncio.Semaphore(5)  # Limit to 5 concurrent requests
+        self.queue_enrichment = (
+            self.config.get("Enrichment", "mode", "inline") == "queue"
+        )
+        self.write_buffer = WriteBuffer(
+            self.db_handler,
+            max_items=self.config.getint("Database", "batch_size", fallback=50),
+            max_age_seconds=self.config.getint(
+                "Database", "batch_max_age_seconds", fallback=30
+            ),
+        )
+
+    def apply_settings(self, settings: ScraperSettings):
+        previous = self.settings
+        super().apply_settings(settings)
+        # Request pacing is handled by the per-host rate limiter in
+        # fetch_page; this only bounds how many detail pages are in flight.
+        # Fetches holding the old semaphore release it as they finish.
+        if previous is None or previous.max_concurrency != settings.max_concurrency:
+            self.semaphore = asyncio.Semaphore(settings.max_concurrency)
 
     @staticmethod
-    def create_hash(item: Dict[str, str]) -> str:
-        hash_string = f"{item['title']}_{item['url']}_{item['date']}"
-        return hashlib.md5(hash_string.encode()).hexdigest()
-
-    async def scrape(self):
-        url = self.config.get("Scraper", "homepage_url")
-        content = await self.fetch_page_content(url)
-        if content:
-            soup = BeautifulSoup(content, "html.parser")
-            news = await self.extract_news(soup)
-            new_releases = await self.extract_new_releases(soup)
-            await self.update_news_and_releases(news, new_releases)
-        await self.close_session()
-
-    async def fetch_news_content(self, url: str) -> str:
-        session = await self.get_session()
-        async with session.get(url) as response:
-            if response.status == 200:
-                content = await response.text()
-                soup = BeautifulSoup(content, "html.parser")
-                content_div = soup.find("div", class_="mw-parser-output")
-                if content_div:
-                    paragraphs = content_div.find_all("p")
-                    return "\n".join([p.text for p in paragraphs])
-            return "Error fetching news content"
-
-    async def fetch_release_system(self, url: str) -> str:
-        session = await self.get_session()
-        async with session.get(url) as response:
-            if response.status == 200:
-                content = await response.text()
-                soup = BeautifulSoup(content, "html.parser")
-                system_col = soup.find("td", string="System")
-                if system_col:
-                    system = system_col.find_next_sibling("td").text.strip()
-                    return system if system else "Unknown"
-            return "Unknown"
-
-    async def extract_news(self, soup: BeautifulSoup) -> List[NewsItem]:
-        news_items: List[NewsItem] = []
-        news_section = soup.find("div", class_="heading", string="Hidden Palace news")
+    def record_item_status(kind: str, status: HashStatus):
+        for state in ("unknown", "incomplete", "done"):
+            METRICS.inc(
+                "cryptkeeper_items_total",
+                len(getattr(status, state)),
+                kind=kind,
+                state=state,
+            )
 
-        if news_section:
-            news_list = news_section.find_next("div", class_="cell").find_all("dd")
+    async def scrape(self) -> int:
+        url = self.settings.homepage_url
+        new_items = 0
+        result = await self.fetch_page(url, conditional=True, snapshot_kind="homepage")
+        if result.unchanged:
+            logging.info("Homepage unchanged since last cycle")
+        elif result.content:
+            news_entries, release_entries = await self.run_parser(
+                parse_homepage, result.content, self.parser
+            )
+            news = await self.extract_news(news_entries)
+            new_releases = await self.extract_new_releases(release_entries)
+            new_items = await self.update_news_and_releases(news, new_releases)
+            await self.db_handler.write_batch(
+                WriteBatch(
+                    validators={url: result.validators},
+                    snapshots=[result.snapshot] if result.snapshot else [],
+                )
+            )
+        return new_items
+
+    async def fetch_news_content(self, url: str) -> FetchResult:
+        extractor = NewsContentExtractor if self.settings.stream_details else None
+        result = await self.fetch_page(url, extractor=extractor, snapshot_kind="news")
+        content = None
+        if extractor is not None:
+            content = result.extracted
+        elif result.content:
+            content = await self.run_parser(
+                parse_news_content, result.content, self.parser
+            )
+        result.extracted = content if content is not None else self.NEWS_PLACEHOLDER
+        return result
 
-            for item in news_list:
-                if item.find("b") is None:
-                    continue
-                date_str = item.find("b").text.strip().rstrip(":")
-                title = item.find("a").text.strip()
-                url = self.config.get("Scraper", "base_url") + item.find("a")["href"]
+    async def fetch_release_system(self, url: str) -> FetchResult:
+        extractor = ReleaseSystemExtractor if self.settings.stream_details else None
+        result = await self.fetch_page(
+            url, extractor=extractor, snapshot_kind="release"
+        )
+        system = None
+        if extractor is not None:
+            system = result.extracted
+        elif result.content:
+            system = await self.run_parser(
+                parse_release_system, result.content, self.parser
+            )
+        result.extracted = system or self.SYSTEM_PLACEHOLDER
+        return result
 
-                news_item: NewsItem = NewsItem(date=date_str, title=title, url=url)
-                news_item.hash = self.create_hash(news_item.__dict__)
+    @staticmethod
+    def news_item(entry: Dict[str, str], base_url: str) -> NewsItem:
+        return NewsItem(
+            date=entry["date"], title=entry["title"], url=base_url + entry["href"]
+        )
 
-                if not await self.db_handler.check_news_exists(
-                    news_item.hash
-                ) or not await self.db_handler.check_news_has_content(news_item.hash):
-                    news_items.append(news_item)
-                else:
-                    logging.info(f'News item "{title}" already exists in database')
+    @staticmethod
+    def release_item(entry: Dict[str, str], base_url: str) -> ReleaseItem:
+        return ReleaseItem(
+            date=entry["date"],
+            title=entry["title"],
+            url=base_url + entry["href"],
+            author=entry["author"],
+        )
 
-        return news_items
+    async def extract_news(self, entries: List[Dict[str, str]]) -> List[NewsItem]:
+        news_items: List[NewsItem] = []
 
-    async def extract_new_releases(self, soup: BeautifulSoup) -> List[ReleaseItem]:
-        new_releases: List[ReleaseItem] = []
-        releases_section = soup.find(
-            "div", class_="heading", string="Community releases"
-        )
+        if entries:
+            base_url = self.settings.base_url
+            for entry in entries:
+                news_items.append(self.news_item(entry, base_url))
 
-        if releases_section:
-            release_list = releases_section.find_next("div", class_="cell").find_all(
-                "li"
+            status = await self.db_handler.classify_news_hashes(
+                item.hash for item in news_items
             )
+            self.record_item_status("news", status)
+            for news_item in news_items:
+                if not status.needs_work(news_item.hash):
+                    logging.info(
+                        f'News item "{news_item.title}" already exists in database'
+                    )
+            news_items = [item for item in news_items if status.needs_work(item.hash)]
 
-            for item in release_list:
-                date_str = item.contents[0].strip().rstrip(":")
-                title = item.find("a").text.strip()
-                url = self.config.get("Scraper", "base_url") + item.find("a")["href"]
-                author = (
-                    item.contents[-1].text.strip()
-                    if len(item.contents) > 2
-                    else "Unknown"
-                )
+        return news_items
 
-                new_release_item: ReleaseItem = ReleaseItem(
-                    date=date_str, title=title, url=url, author=author
-                )
-                new_release_item.hash = self.create_hash(new_release_item.__dict__)
+    async def extract_new_releases(
+        self, entries: List[Dict[str, str]]
+    ) -> List[ReleaseItem]:
+        new_releases: List[ReleaseItem] = []
 
-                if not await self.db_handler.check_new_releases_exists(
-                    new_release_item.hash
-                ) or not await self.db_handler.check_new_releases_has_system(
-                    new_release_item.hash
-                ):
-                    new_releases.append(new_release_item)
-                else:
-                    logging.info(f'Release item "{title}" already exists in database')
+        if entries:
+            base_url = self.settings.base_url
+            for entry in entries:
+                new_releases.append(self.release_item(entry, base_url))
+
+            status = await self.db_handler.classify_release_hashes(
+                item.hash for item in new_releases
+            )
+            self.record_item_status("releases", status)
+            for new_release_item in new_releases:
+                if not status.needs_work(new_release_item.hash):
+                    logging.info(
+                        f'Release item "{new_release_item.title}" already exists in database'
+                    )
+            new_releases = [
+                item for item in new_releases if status.needs_work(item.hash)
+            ]
 
         return new_releases
 
     async def update_news_and_releases(
-        self, news: List[NewsItem], new_releases: List[ReleaseItem]
-    ):
-        new_news_items = []
-        new_releases_items = []
-
+        self,
+        news: List[NewsItem],
+        new_releases: List[ReleaseItem],
+        notify: bool = True,
+    ) -> int:
+        # Extracted items are either unknown or still missing their detail
+        # field, so they are all inserted up front and all enriched below.
+        result = await self.db_handler.write_batch(
+            WriteBatch(
+                news=news,
+                releases=new_releases,
+                notify_new=notify and self.queue_enrichment,
+            )
+        )
+        new_news_items = [item for item in news if item.hash in result.inserted_news]
+        new_releases_items = [
+            item for item in new_releases if item.hash in result.inserted_releases
+        ]
+        if self.queue_enrichment:
+            # Inserting the items queued their enrichment jobs; the worker
+            # that completes each job sends its notification.
+            return len(new_news_items) + len(new_releases_items)
+
+        # Every item here still lacks its details, so detail pages are always
+        # fetched in full: a conditional request keyed by URL would answer 304
+        # for a renamed or redated item whose page was cached under its old
+        # row, and leave the new row unenriched.
         async def process_news_item(item: NewsItem):
             async with self.semaphore:
-                if await self.db_handler.insert_news(item):
-                    new_news_items.append(item)
-
-                if not await self.db_handler.check_news_has_content(item.hash):
-                    content = await self.fetch_news_content(item.url)
-                    await self.db_handler.update_news_content(item.hash, content)
-                    logging.info(f"Content updated for {item.title}")
-
-                await asyncio.sleep(5)
+                result = await self.fetch_news_content(item.url)
+                await self.write_buffer.add_news_content(
+                    item.hash, result.extracted, result.snapshot
+                )
+                logging.info(f"Content updated for {item.title}")
 
         async def process_release_item(item: ReleaseItem):
             async with self.semaphore:
-                if await self.db_handler.insert_release(item):
-                    new_releases_items.append(item)
-
-                if not await self.db_handler.check_new_releases_has_system(item.hash):
-                    system = await self.fetch_release_system(item.url)
-                    await self.db_handler.update_release_system(item.hash, system)
-                    item.system = system
-                    logging.info(f"System updated for {item.title}")
-                await asyncio.sleep(5)
-
-        await asyncio.gather(
-            *[process_news_item(item) for item in news],
-            *[process_release_item(item) for item in new_releases],
-        )
+                result = await self.fetch_release_system(item.url)
+                await self.write_buffer.add_release_system(
+                    item.hash, result.extracted, result.snapshot
+                )
+                item.system = result.extracted
+                logging.info(f"System updated for {item.title}")
+
+        try:
+            await asyncio.gather(
+                *[process_news_item(item) for item in news],
+                *[process_release_item(item) for item in new_releases],
+            )
+        finally:
+            await self.write_buffer.flush()
 
         logging.info("News and releases updated")
 
-        if new_news_items:
+        if notify and new_news_items:
             await self.send_news_notification(new_news_items)
-        if new_releases_items:
+        if notify and new_releases_items:
             await self.send_releases_notification(new_releases_items)
 
+        return len(new_news_items) + len(new_releases_items)
+
     async def send_news_notification(self, new_news_items: List[NewsItem]):
-        logging.info(f"Sending notification for {len(new_news_items)} new news items")
-        message = "New Hidden Palace News:\n\n<ul>"
-        for item in new_news_items:
-            message += f"<li><a href='{item.url}'>{item.title}</a></li>"
-        message += "</ul>"
-        await self.notification_manager.send_notification(
-            f"There are {len(new_news_items)} new Hidden Palace News!",
-            message,
+        logging.info(f"Queueing notification for {len(new_news_items)} new news items")
+        await self.notification_manager.send_digest(
+            "news",
+            "There are {count} new Hidden Palace News!",
+            [
+                f"<li><a href='{item.url}'>{item.title}</a></li>"
+                for item in new_news_items
+            ],
+            header="New Hidden Palace News:",
             html=1,
         )
 
     async def send_releases_notification(self, new_releases_items: List[ReleaseItem]):
-        logging.info(f"Sending notification for {len(new_releases_items)} new releases")
-        message = "New Community Releases:\n\n<ul>"
-        for item in new_releases_items:
-            message += f"<li><a href='{item.url}'>[{item.system}] {item.title}</a></li>"
-        message += "</ul>"
-        await self.notification_manager.send_notification(
-            f"There are {len(new_releases_items)} new Community Releases!",
-            message,
+        logging.info(
+            f"Queueing notification for {len(new_releases_items)} new releases"
+        )
+        await self.notification_manager.send_digest(
+            "releases",
+            "There are {count} new Community Releases!",
+            [
+                f"<li><a href='{item.url}'>[{item.system}] {item.title}</a></li>"
+                for item in new_releases_items
+            ],
+            header="New Community Releases:",
             html=1,
         )
@@ -0,0 +1,24 @@
+import importlib
+from typing import Dict, Type
+from .base_scraper import BaseScraper
+
+# Built-in scrapers by short name; anything else is imported by dotted path.
+SCRAPERS: Dict[str, str] = {
+    "homepage": "src.scrapers.homepage_scraper.HomepageScraper",
+    "backfill": "src.scrapers.backfill_scraper.BackfillScraper",
+}
+
+
+def register_scraper(name: str, path: str):
+    SCRAPERS[name] = path
+
+
+def get_scraper_class(name: str) -> Type[BaseScraper]:
+    path = SCRAPERS.get(name, name)
+    module_name, _, class_name = path.rpartition(".")
+    if not module_name:
+        raise ValueError(f"Unknown scraper {name!r}")
+    scraper_class = getattr(importlib.import_module(module_name), class_name)
+    if not issubclass(scraper_class, BaseScraper):
+        raise TypeError(f"{path} is not a BaseScraper subclass")
+    return scraper_class
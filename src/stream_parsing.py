@@ -0,0 +1,116 @@
+from abc import ABC, abstractmethod
+from html.parser import HTMLParser
+from typing import List, Optional
+
+# Incremental counterparts of parse_news_content / parse_release_system. They
+# are fed decoded chunks as the response streams in and set ``done`` once the
+# element they need has closed, so the caller can stop reading the body.
+
+
+class StreamExtractor(HTMLParser, ABC):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.done = False
+
+    @abstractmethod
+    def result(self) -> Optional[str]:
+        pass
+
+
+class NewsContentExtractor(StreamExtractor):
+    def __init__(self):
+        super().__init__()
+        self.found = False
+        self.div_depth = 0
+        self.in_paragraph = False
+        self.current: List[str] = []
+        self.paragraphs: List[str] = []
+
+    def close_paragraph(self):
+        if self.in_paragraph:
+            self.paragraphs.append("".join(self.current))
+            self.in_paragraph = False
+            self.current = []
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == "div":
+            if self.div_depth:
+                self.div_depth += 1
+            elif "mw-parser-output" in (dict(attrs).get("class") or "").split():
+                self.found = True
+                self.div_depth = 1
+        elif tag == "p" and self.div_depth:
+            self.close_paragraph()
+            self.in_paragraph = True
+
+    def handle_endtag(self, tag):
+        if self.done or not self.div_depth:
+            return
+        if tag == "p":
+            self.close_paragraph()
+        elif tag == "div":
+            self.div_depth -= 1
+            if not self.div_depth:
+                self.close_paragraph()
+                self.done = True
+
+    def handle_data(self, data):
+        if self.in_paragraph and not self.done:
+            self.current.append(data)
+
+    def result(self) -> Optional[str]:
+        if not self.found:
+            return None
+        self.close_paragraph()
+        return "\n".join(self.paragraphs)
+
+
+class ReleaseSystemExtractor(StreamExtractor):
+    def __init__(self):
+        super().__init__()
+        self.in_cell = False
+        self.cell: List[str] = []
+        self.label_found = False
+        self.system: Optional[str] = None
+
+    def close_cell(self):
+        if not self.in_cell:
+            return
+        text = "".join(self.cell)
+        self.in_cell = False
+        self.cell = []
+        if self.label_found:
+            self.system = text.strip() or None
+            self.done = True
+        elif text == "System":
+            self.label_found = True
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == "td":
+            self.close_cell()
+            self.in_cell = not self.done
+        elif tag == "tr":
+            self.close_cell()
+            # A "System" label without a value cell in its row has no system.
+            if self.label_found:
+                self.done = True
+
+    def handle_endtag(self, tag):
+        if self.done:
+            return
+        if tag == "td":
+            self.close_cell()
+        elif tag in ("tr", "table") and self.label_found:
+            self.close_cell()
+            self.done = True
+
+    def handle_data(self, data):
+        if self.in_cell and not self.done:
+            self.cell.append(data)
+
+    def result(self) -> Optional[str]:
+        return self.system
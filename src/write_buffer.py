@@ -0,0 +1,88 @@
+import asyncio
+import logging
+from typing import Optional
+from src.database import DatabaseHandler
+from src.models import PageSnapshot, WriteBatch
+
+
+class WriteBuffer:
+    def __init__(
+        self,
+        db_handler: DatabaseHandler,
+        max_items: int = 50,
+        max_age_seconds: float = 30.0,
+    ):
+        self.db_handler = db_handler
+        self.max_items = max_items
+        self.max_age_seconds = max_age_seconds
+        self.batch = WriteBatch()
+        self.timer: Optional[asyncio.Task] = None
+        self.flush_lock = asyncio.Lock()
+
+    async def add_news_content(
+        self,
+        item_hash: bytes,
+        content: str,
+        snapshot: Optional[PageSnapshot] = None,
+    ):
+        self.batch.news_content[item_hash] = content
+        await self.added(snapshot)
+
+    async def add_release_system(
+        self,
+        item_hash: bytes,
+        system: str,
+        snapshot: Optional[PageSnapshot] = None,
+    ):
+        self.batch.release_systems[item_hash] = system
+        await self.added(snapshot)
+
+    async def added(self, snapshot: Optional[PageSnapshot] = None):
+        if snapshot is not None:
+            self.batch.snapshots.append(snapshot)
+        if self.timer is None:
+            self.timer = asyncio.create_task(self.flush_after_max_age())
+        if len(self.batch) >= self.max_items:
+            await self.flush()
+
+    async def flush_after_max_age(self):
+        await asyncio.sleep(self.max_age_seconds)
+        self.timer = None
+        try:
+            await self.flush()
+        except Exception:  # pylint: disable=broad-except
+            # Nobody awaits the timer task, so the failure is logged here;
+            # the rows are back in the buffer and the timer tries again.
+            logging.exception("Flushing buffered database updates failed")
+            if self.timer is None and len(self.batch):
+                self.timer = asyncio.create_task(self.flush_after_max_age())
+
+    async def flush(self):
+        async with self.flush_lock:
+            if self.timer is not None and self.timer is not asyncio.current_task():
+                self.timer.cancel()
+            self.timer = None
+            batch, self.batch = self.batch, WriteBatch()
+            if len(batch):
+                try:
+                    await self.db_handler.write_batch(batch)
+                except Exception:
+                    self.restore(batch)
+                    raise
+                logging.info(f"Flushed {len(batch)} buffered database updates")
+
+    def restore(self, batch: WriteBatch):
+        # Puts a batch that failed to commit back in front of whatever was
+        # buffered during the attempt; newer values for the same key win.
+        self.batch.news[:0] = batch.news
+        self.batch.releases[:0] = batch.releases
+        self.batch.news_content = {**batch.news_content, **self.batch.news_content}
+        self.batch.release_systems = {
+            **batch.release_systems,
+            **self.batch.release_systems,
+        }
+        self.batch.snapshots[:0] = batch.snapshots
+        self.batch.notify_new = self.batch.notify_new or batch.notify_new
+
+    async def close(self):
+        await self.flush()